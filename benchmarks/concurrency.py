@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Compare how many concurrent requests the WSGI and ASGI deployments handle.
+
+Each server configuration is started with gunicorn on a local port, as in the
+Dockerfile, and the given paths are requested with increasing numbers of
+concurrent clients. Run it from the project root with the same environment
+(.env) the site uses, for example::
+
+    uv run benchmarks/concurrency.py --path /events/feed.ics --path /
+    uv run benchmarks/concurrency.py --path /song/some-song --session <sessionid>
+
+Pages that need a login take the value of a ``sessionid`` cookie copied from
+a logged-in browser. The servers run with DEBUG off, so run collectstatic
+first.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SERVERS = {
+    "wsgi": [
+        "--worker-class", "gthread", "--threads", "8",
+        "lhc_sharing.wsgi:application",
+    ],
+    "asgi": [
+        "--worker-class", "uvicorn_worker.UvicornWorker",
+        "lhc_sharing.asgi:application",
+    ],
+}
+
+
+def start_server(name, port):
+    cmd = [
+        sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+        "--workers", "1", "--timeout", "0", "--log-level", "warning",
+        *SERVERS[name],
+    ]
+    process = subprocess.Popen(cmd, env={**os.environ, "DEBUG": "False"})
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://localhost:{port}/", timeout=1)
+            return process
+        except urllib.error.HTTPError:
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} server did not start")
+
+
+def fetch(url, session):
+    request = urllib.request.Request(url)
+    if session:
+        request.add_header("Cookie", f"sessionid={session}")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+        ok = True
+    except OSError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_load(base_url, paths, concurrency, total, session):
+    urls = [base_url + paths[i % len(paths)] for i in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda url: fetch(url, session), urls))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--path", action="append", default=[], dest="paths")
+    parser.add_argument(
+        "--concurrency", type=int, action="append", dest="levels",
+        help="Concurrent clients (repeatable, default 1, 8, 32, 64)",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--session", help="sessionid cookie for member pages")
+    parser.add_argument("--server", choices=SERVERS, action="append")
+    args = parser.parse_args()
+
+    paths = args.paths or ["/"]
+    levels = args.levels or [1, 8, 32, 64]
+    print(f"{'server':<6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'errors':>6}")
+    for name in args.server or list(SERVERS):
+        process = start_server(name, args.port)
+        try:
+            base_url = f"http://localhost:{args.port}"
+            run_load(base_url, paths, 4, 20, args.session)  # warm up
+            for level in levels:
+                result = run_load(base_url, paths, level, args.requests, args.session)
+                print(
+                    f"{name:<6} {level:>7} {result['rps']:>8.1f} "
+                    f"{result['p50']:>8.1f} {result['p95']:>8.1f} "
+                    f"{result['errors']:>6}"
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
 uv sync
+uv run vendor_static.py
 uv run manage.py migrate
+uv run manage.py createcachetable
 uv run manage.py collectstatic --noinput
@@ -1,12 +1,32 @@
 import copy
+import csv
 import datetime
+import heapq
+from collections import defaultdict
+from operator import attrgetter
 
-from dateutil import rrule
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.admin import widgets as admin_widgets
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 
-from events.models import Event, EventType, Occurrence
+from events.models import (
+    ArchivedOccurrence,
+    Event,
+    EventType,
+    Occurrence,
+    RotaFeedToken,
+)
+from events.rota import invalidate_rota_feeds, signed_up_users
+from events.scheduling import find_overlaps
 
 WEEKDAY_LONG = (
     (7, "Sunday"),
@@ -19,16 +39,9 @@ WEEKDAY_LONG = (
 )
 
 
-ISO_WEEKDAYS_MAP = (
-    None,
-    rrule.MO,
-    rrule.TU,
-    rrule.WE,
-    rrule.TH,
-    rrule.FR,
-    rrule.SA,
-    rrule.SU,
-)
+def rrule_weekday(iso_weekday):
+    # dateutil.rrule accepts weekdays as integers counted from Monday = 0.
+    return iso_weekday - 1
 
 
 @admin.register(EventType)
@@ -36,7 +49,11 @@ class EventTypeAdmin(admin.ModelAdmin):
     pass
 
 
-class RecurringEventForm(forms.ModelForm):
+class RecurrenceForm(forms.Form):
+    """The fields for adding a series of occurrences to an event."""
+
+    max_occurrences = 366
+
     start_time = forms.SplitDateTimeField(
         widget=admin_widgets.AdminSplitDateTime(),
         help_text="The start date and time of the first occurrence to be added",
@@ -67,10 +84,11 @@ class RecurringEventForm(forms.ModelForm):
         help_text="The location of the event",
         required=False,
     )
-
-    class Meta:
-        model = Event
-        fields = "__all__"
+    allow_overlaps = forms.BooleanField(
+        label="Allow overlaps",
+        help_text="Add the occurrences even if they overlap existing ones",
+        required=False,
+    )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -105,9 +123,65 @@ class RecurringEventForm(forms.ModelForm):
                 cleaned_data["end_time"],
                 cleaned_data["start_time"].tzinfo,
             )
+        if self.has_recurrence():
+            # One past the limit is enough to tell the rule is too long.
+            self.candidates = self.expand(Event(), limit=self.max_occurrences + 1)
+            if len(self.candidates) > self.max_occurrences:
+                raise forms.ValidationError(
+                    f"That adds more than {self.max_occurrences} occurrences, "
+                    f"the most that can be added at once."
+                )
 
         return cleaned_data
 
+    def has_recurrence(self):
+        return bool(
+            self.cleaned_data.get("start_time") and self.cleaned_data.get("end_time")
+        )
+
+    def expand(self, event, limit=None):
+        """The occurrences the rule adds to ``event``, without saving them."""
+        return event.expand_occurrences(limit=limit, **self.occurrence_params())
+
+    def occurrence_params(self):
+        return {
+            "start_time": self.cleaned_data["start_time"],
+            "end_time": self.cleaned_data["end"],
+            "count": self.cleaned_data.get("count"),
+            "until": self.cleaned_data.get("until"),
+            "byweekday": [rrule_weekday(day) for day in self.cleaned_data["days"]],
+            "location": self.cleaned_data.get("location", ""),
+        }
+
+
+class RecurringEventForm(RecurrenceForm, forms.ModelForm):
+    max_listed_overlaps = 10
+
+    class Meta:
+        model = Event
+        fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.has_recurrence() and not cleaned_data.get("allow_overlaps"):
+            found = find_overlaps(self.candidates)
+            if found:
+                errors = [
+                    f"{start_label(candidate)} overlaps {existing}"
+                    for candidate, existing in found[: self.max_listed_overlaps]
+                ]
+                if len(found) > self.max_listed_overlaps:
+                    errors.append(f"and {len(found) - self.max_listed_overlaps} more")
+                errors.append(
+                    "Change the times, or tick \"Allow overlaps\" to add them anyway."
+                )
+                raise forms.ValidationError(errors)
+        return cleaned_data
+
+
+def start_label(occurrence):
+    return timezone.localtime(occurrence.start_time).strftime("%a %d %b %Y %H:%M")
+
 
 class InlineOccurrenceForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -161,6 +235,7 @@ class EventAdmin(admin.ModelAdmin):
                     "until",
                     "days",
                     "location",
+                    "allow_overlaps",
                 )
             },
         ),
@@ -173,22 +248,358 @@ class EventAdmin(admin.ModelAdmin):
             fieldsets[1][1]["classes"] = ["collapse"]
         return fieldsets
 
+    def get_urls(self):
+        return [
+            path(
+                "preview/",
+                self.admin_site.admin_view(self.preview_view),
+                name="events_event_preview",
+            ),
+        ] + super().get_urls()
+
+    def preview_view(self, request):
+        """
+        Show the occurrences the recurring event fields would add, and any
+        that overlap the calendar, without writing anything. The change
+        form's script asks for just the fragment with ``X-Partial``.
+        """
+        if not (
+            self.has_add_permission(request) or self.has_change_permission(request)
+        ):
+            raise PermissionDenied
+        form = RecurrenceForm(request.POST or None)
+        context = {"form": form}
+        if form.is_valid() and form.has_recurrence():
+            found = find_overlaps(form.candidates)
+            overlapping = defaultdict(list)
+            for candidate, existing in found:
+                overlapping[id(candidate)].append(existing)
+            context["occurrences"] = [
+                (candidate, overlapping.get(id(candidate), []))
+                for candidate in form.candidates
+            ]
+            context["overlap_count"] = len(overlapping)
+        if request.headers.get("X-Partial"):
+            template = "admin/events/event/recurrence_preview.html"
+        else:
+            template = "admin/events/event/preview.html"
+            context.update({
+                **self.admin_site.each_context(request),
+                "opts": self.opts,
+                "title": "Preview recurring event",
+            })
+        return TemplateResponse(request, template, context)
+
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        if form.cleaned_data.get("start_time") and form.cleaned_data.get("end_time"):
-            obj.add_occurrences(
-                start_time=form.cleaned_data["start_time"],
-                end_time=form.cleaned_data["end"],
-                count=form.cleaned_data.get("count"),
-                until=form.cleaned_data.get("until"),
-                byweekday=[ISO_WEEKDAYS_MAP[day] for day in form.cleaned_data["days"]],
-                location=form.cleaned_data.get("location", ""),
-            )
+        if form.has_recurrence():
+            obj.add_occurrences(**form.occurrence_params())
+
+
+class RotaExportForm(forms.Form):
+    start = forms.DateField(widget=admin_widgets.AdminDateWidget())
+    end = forms.DateField(
+        widget=admin_widgets.AdminDateWidget(), help_text="Included in the export"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and end < start:
+            raise forms.ValidationError("The end date is before the start date.")
+        return cleaned_data
+
+
+class Echo:
+    """A file-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+ROTA_HEADER = [
+    "Event", "Date", "Start", "End", "Location", "Break", "Opener", "Closer"
+]
+
+
+def member_name(user):
+    return (user.get_full_name() or user.username) if user else ""
+
+
+def rota_rows(occurrences):
+    writer = csv.writer(Echo())
+    yield writer.writerow(ROTA_HEADER)
+    for occurrence in occurrences:
+        start = timezone.localtime(occurrence.start_time)
+        end = occurrence.end_time and timezone.localtime(occurrence.end_time)
+        yield writer.writerow([
+            occurrence.event.title,
+            start.date().isoformat(),
+            "" if occurrence.all_day else start.strftime("%H:%M"),
+            "" if occurrence.all_day or not end else end.strftime("%H:%M"),
+            occurrence.location,
+            "yes" if occurrence.is_break else "",
+            member_name(occurrence.opener),
+            member_name(occurrence.closer),
+        ])
+
+
+class BulkLocationForm(forms.Form):
+    location = forms.CharField(
+        max_length=255, required=False, help_text="Leave empty to clear it"
+    )
+
+
+class BulkShiftForm(forms.Form):
+    offset = forms.DurationField(
+        help_text=(
+            "How far to move the start and end times, as HH:MM:SS with an "
+            "optional number of days first, e.g. 00:30:00, -01:00:00 or "
+            "7 00:00:00"
+        )
+    )
+
+    def clean_offset(self):
+        offset = self.cleaned_data["offset"]
+        if not offset:
+            raise forms.ValidationError("Enter a non-zero offset.")
+        return offset
+
+
+class BulkMemberForm(forms.Form):
+    member = forms.ModelChoiceField(
+        User.objects.filter(is_active=True).order_by("first_name", "last_name"),
+        required=False,
+        help_text="Leave empty to clear it",
+    )
+
+
+def bulk_update_occurrences(queryset, **updates):
+    """
+    Apply ``updates`` to every occurrence in ``queryset`` with one UPDATE.
+    ``update()`` doesn't send ``post_save``, so the rota feeds and the
+    events feed are refreshed here.
+    """
+    queryset = queryset.order_by()
+    with transaction.atomic():
+        members = signed_up_users(queryset)
+        count = queryset.update(**updates)
+    members |= {
+        updates[role].pk
+        for role in ("opener", "closer")
+        if updates.get(role) is not None
+    }
+    invalidate_rota_feeds(members)
+
+    from events.apps import purge_event_feed
+
+    purge_event_feed()
+    return count
 
 
 @admin.register(Occurrence)
 class OccurrenceAdmin(admin.ModelAdmin):
     list_display = ("__str__", "start_time", "end_time", "all_day", "location", "event")
+    list_filter = ("event", "is_break")
+    search_fields = ("event__title",)
+    date_hierarchy = "start_time"
+    actions = [
+        "mark_break",
+        "unmark_break",
+        "set_location",
+        "shift_times",
+        "set_opener",
+        "set_closer",
+    ]
+    bulk_preview_size = 20
+
+    def bulk_action(self, request, queryset, title, get_updates, form_class=None):
+        """
+        Show how many occurrences an action will change, with a form for any
+        value it needs, and apply it once the admin confirms.
+        """
+        applying = "apply" in request.POST
+        form = form_class(request.POST if applying else None) if form_class else None
+        if applying and (form is None or form.is_valid()):
+            updates = get_updates(form.cleaned_data if form else {})
+            count = bulk_update_occurrences(queryset, **updates)
+            self.message_user(
+                request, f"{title}: {count} occurrences updated.", messages.SUCCESS
+            )
+            return None
+        return TemplateResponse(
+            request,
+            "admin/events/occurrence/bulk_action.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.opts,
+                "title": title,
+                "form": form,
+                "count": queryset.count(),
+                "preview": queryset.select_related("event")[: self.bulk_preview_size],
+                "action": request.POST["action"],
+                "select_across": request.POST.get("select_across", "0"),
+                "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+                "media": self.media + (form.media if form else forms.Media()),
+            },
+        )
+
+    @admin.action(
+        description="Mark selected occurrences as breaks", permissions=["change"]
+    )
+    def mark_break(self, request, queryset):
+        return self.bulk_action(
+            request, queryset, "Mark as breaks", lambda data: {"is_break": True}
+        )
+
+    @admin.action(
+        description="Unmark selected occurrences as breaks", permissions=["change"]
+    )
+    def unmark_break(self, request, queryset):
+        return self.bulk_action(
+            request, queryset, "Unmark as breaks", lambda data: {"is_break": False}
+        )
+
+    @admin.action(
+        description="Set the location of selected occurrences", permissions=["change"]
+    )
+    def set_location(self, request, queryset):
+        return self.bulk_action(
+            request,
+            queryset,
+            "Set location",
+            lambda data: {"location": data["location"]},
+            BulkLocationForm,
+        )
+
+    @admin.action(
+        description="Shift the times of selected occurrences", permissions=["change"]
+    )
+    def shift_times(self, request, queryset):
+        return self.bulk_action(
+            request,
+            queryset,
+            "Shift times",
+            lambda data: {
+                "start_time": F("start_time") + data["offset"],
+                "end_time": F("end_time") + data["offset"],
+            },
+            BulkShiftForm,
+        )
+
+    @admin.action(
+        description="Set or clear the opener of selected occurrences",
+        permissions=["change"],
+    )
+    def set_opener(self, request, queryset):
+        return self.bulk_action(
+            request,
+            queryset,
+            "Set opener",
+            lambda data: {"opener": data["member"]},
+            BulkMemberForm,
+        )
+
+    @admin.action(
+        description="Set or clear the closer of selected occurrences",
+        permissions=["change"],
+    )
+    def set_closer(self, request, queryset):
+        return self.bulk_action(
+            request,
+            queryset,
+            "Set closer",
+            lambda data: {"closer": data["member"]},
+            BulkMemberForm,
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_rota_view),
+                name="events_occurrence_export",
+            ),
+        ] + super().get_urls()
+
+    def export_rota_view(self, request):
+        """
+        Stream the opener/closer rota for a date range as CSV. Rows are read
+        with a server-side cursor and written as they arrive, so memory use
+        doesn't grow with the number of occurrences. Live and archived
+        occurrences are merged in ``(start_time, id)`` order.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        form = RotaExportForm(request.GET or None)
+        if not form.is_valid():
+            return TemplateResponse(
+                request,
+                "admin/events/occurrence/export.html",
+                {
+                    **self.admin_site.each_context(request),
+                    "opts": self.opts,
+                    "title": "Export rota",
+                    "form": form,
+                    "media": self.media + form.media,
+                },
+            )
+        start, end = form.cleaned_data["start"], form.cleaned_data["end"]
+        tz = timezone.get_current_timezone()
+
+        def in_range(model):
+            return (
+                model.objects.filter(
+                    start_time__gte=datetime.datetime.combine(
+                        start, datetime.time.min, tzinfo=tz
+                    ),
+                    start_time__lt=datetime.datetime.combine(
+                        end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz
+                    ),
+                )
+                .select_related("event", "opener", "closer")
+                .order_by("start_time", "id")
+                .iterator(chunk_size=500)
+            )
+
+        occurrences = heapq.merge(
+            in_range(Occurrence),
+            in_range(ArchivedOccurrence),
+            key=attrgetter("start_time", "id"),
+        )
+        return StreamingHttpResponse(
+            rota_rows(occurrences),
+            content_type="text/csv",
+            headers={
+                "Content-Disposition": f'attachment; filename="rota-{start}-{end}.csv"'
+            },
+        )
+
+
+@admin.register(ArchivedOccurrence)
+class ArchivedOccurrenceAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "start_time", "location", "opener", "closer")
     list_filter = ("event",)
     search_fields = ("event__title",)
     date_hierarchy = "start_time"
+    list_select_related = ("event", "opener", "closer")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RotaFeedToken)
+class RotaFeedTokenAdmin(admin.ModelAdmin):
+    list_display = ("user", "created_at")
+    search_fields = ("user__username", "user__email")
+    readonly_fields = ("token",)
+    actions = ["reset_tokens"]
+
+    @admin.action(description="Reset feed links")
+    def reset_tokens(self, request, queryset):
+        for feed_token in queryset:
+            feed_token.reset()
@@ -1,6 +1,38 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+
+def purge_event_feed():
+    from django.urls import reverse
+
+    from lhc_sharing.caching import purge_paths
+
+    purge_paths([reverse("event-feed")])
+
+
+@receiver(post_save, sender="events.Occurrence")
+@receiver(post_delete, sender="events.Occurrence")
+def handle_occurrence_changed(sender, instance, **kwargs):
+    from events.rota import invalidate_rota_feeds
+
+    invalidate_rota_feeds({
+        instance.opener_id,
+        instance.closer_id,
+        *getattr(instance, "_loaded_signups", ()),
+    })
+    purge_event_feed()
+
+
+@receiver(post_save, sender="events.Event")
+def handle_event_changed(sender, instance, created, **kwargs):
+    if not created:
+        from events.rota import invalidate_event_rota_feeds
+
+        invalidate_event_rota_feeds(instance)
+        purge_event_feed()
@@ -0,0 +1,47 @@
+"""
+Moving past occurrences out of the live table.
+
+The calendar, feed and admin all scan ``events_occurrence``, so occurrences
+older than a cutoff are copied into ``ArchivedOccurrence`` and deleted from
+it. History views only read the archive for dates in the past.
+"""
+
+from django.db import transaction
+
+from events.apps import purge_event_feed
+from events.models import ArchivedOccurrence, Occurrence
+from events.rota import invalidate_rota_feeds
+
+ARCHIVED_FIELDS = [
+    field.attname for field in ArchivedOccurrence._meta.concrete_fields
+]
+
+
+def archive_occurrences(cutoff, batch_size=500):
+    """
+    Move occurrences that started before ``cutoff`` into the archive, one
+    transaction per batch. Return how many were moved.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Occurrence.objects.filter(start_time__lt=cutoff)
+                .order_by("start_time", "id")
+                .values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return archived
+            ArchivedOccurrence.objects.bulk_create(
+                ArchivedOccurrence(**row) for row in rows
+            )
+            # Nothing refers to occurrences, so they can be deleted without
+            # collecting them. That skips post_delete, which would refresh
+            # the rota feeds and the CDN once per row rather than per batch.
+            batch = Occurrence.objects.filter(id__in=[row["id"] for row in rows])
+            batch._raw_delete(batch.db)
+        invalidate_rota_feeds(
+            {row[role] for row in rows for role in ("opener_id", "closer_id")}
+        )
+        purge_event_feed()
+        archived += len(rows)
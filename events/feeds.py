@@ -0,0 +1,73 @@
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.db.models import Q, Value
+from django_ical.views import ICalFeed
+
+from events.models import Occurrence
+
+
+class EventFeed(ICalFeed):
+    """
+    A simple event calender
+    """
+    product_id = '-//LHC Members//Events//EN'
+    timezone = 'UTC'
+    title = "London Humanist Choir Events"
+    # file_name = "event.ics"
+
+    def __init__(self):
+        super().__init__()
+        # Django only awaits callable instances that are marked as coroutines.
+        markcoroutinefunction(self)
+
+    async def __call__(self, request, *args, **kwargs):
+        occurrences = [item async for item in self.get_queryset(**kwargs)]
+        return await sync_to_async(super().__call__)(request, occurrences)
+
+    def get_queryset(self, **kwargs):
+        return Occurrence.objects.all().order_by('-start_time').select_related()
+
+    def get_object(self, request, occurrences):
+        return occurrences
+
+    def items(self, occurrences):
+        return occurrences
+
+    def item_title(self, item):
+        return item.event.title
+
+    def item_description(self, item):
+        all_details = "\n\n".join(filter(None, [item.event.details, item.details]))
+        return all_details.replace('**', '')  # Remove markdown bold for iCal
+
+    def item_end_datetime(self, item):
+        return item.end_time
+
+    def item_start_datetime(self, item):
+        return item.start_time
+
+    def item_location(self, item):
+        return item.location
+
+
+class RotaFeed(EventFeed):
+    """The occurrences one member has signed up to open or close."""
+
+    product_id = '-//LHC Members//Rota//EN'
+    title = "My London Humanist Choir rota"
+
+    def get_queryset(self, user_id):
+        return (
+            Occurrence.objects.filter(Q(opener=user_id) | Q(closer=user_id))
+            .exclude(is_break=True)
+            .order_by('-start_time')
+            .select_related("event")
+            .annotate(rota_user_id=Value(user_id))
+        )
+
+    def item_title(self, item):
+        roles = [
+            role
+            for role, user_id in (("Open", item.opener_id), ("Close", item.closer_id))
+            if user_id == item.rota_user_id
+        ]
+        return f"{' & '.join(roles)}: {item.event.title}"
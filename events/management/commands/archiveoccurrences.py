@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.archive import archive_occurrences
+from events.models import Occurrence
+
+
+class Command(BaseCommand):
+    help = "Move past occurrences into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=365,
+            metavar="DAYS",
+            help="Archive occurrences that started more than DAYS ago (default 365)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the occurrences to archive without moving them",
+        )
+
+    def handle(self, *args, older_than, batch_size, dry_run, **options):
+        cutoff = timezone.now() - timedelta(days=older_than)
+        if dry_run:
+            count = Occurrence.objects.filter(start_time__lt=cutoff).count()
+            self.stdout.write(
+                f"{count} occurrences before {cutoff:%Y-%m-%d} to archive"
+            )
+            return
+        count = archive_occurrences(cutoff, batch_size)
+        self.stdout.write(f"Archived {count} occurrences before {cutoff:%Y-%m-%d}")
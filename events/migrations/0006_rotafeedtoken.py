@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:43
+
+import django.db.models.deletion
+import events.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_occurrence_is_break_alter_event_description'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RotaFeedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=events.models.new_rota_token, max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rota_feed_token', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
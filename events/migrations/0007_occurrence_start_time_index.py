@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_rotafeedtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='occurrence',
+            index=models.Index(fields=['start_time', 'id'], name='events_occu_start_t_076a85_idx'),
+        ),
+    ]
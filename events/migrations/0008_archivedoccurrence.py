@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_occurrence_start_time_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOccurrence',
+            fields=[
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('all_day', models.BooleanField(default=False)),
+                ('details', models.TextField(blank=True)),
+                ('is_break', models.BooleanField(default=False)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('closer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='events.event')),
+                ('opener', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start_time'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['start_time', 'id'], name='events_arch_start_t_e6690d_idx')],
+            },
+        ),
+    ]
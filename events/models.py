@@ -1,4 +1,6 @@
-from dateutil import rrule
+import itertools
+import secrets
+
 from django.db import models
 from django.urls import reverse
 from django.utils.functional import cached_property
@@ -60,45 +62,69 @@ class Event(models.Model):
                 start_time=start_time, end_time=end_time, location=location
             )
         else:
-            rrule_params.setdefault("freq", rrule.DAILY)
-            delta = end_time - start_time
-            occurrences = []
-            for ev in rrule.rrule(dtstart=start_time, **rrule_params):
-                occurrences.append(
-                    Occurrence(
-                        start_time=ev,
-                        end_time=ev + delta,
-                        location=location,
-                        event=self,
-                    )
+            self.occurrence_set.bulk_create(
+                self.expand_occurrences(start_time, end_time, location, **rrule_params)
+            )
+
+    def expand_occurrences(
+        self, start_time, end_time, location, limit=None, **rrule_params
+    ):
+        """
+        Return the unsaved occurrences ``add_occurrences`` would create, so
+        they can be checked before anything is written. ``limit`` stops the
+        expansion early, as a rule with a far-off ``until`` can be very long.
+        """
+        if not (rrule_params.get("count") or rrule_params.get("until")):
+            return [
+                Occurrence(
+                    start_time=start_time,
+                    end_time=end_time,
+                    location=location,
+                    event=self,
                 )
-            self.occurrence_set.bulk_create(occurrences)
+            ]
+        from dateutil import rrule
+
+        rrule_params.setdefault("freq", rrule.DAILY)
+        delta = end_time - start_time
+        return [
+            Occurrence(
+                start_time=ev,
+                end_time=ev + delta,
+                location=location,
+                event=self,
+            )
+            for ev in itertools.islice(
+                rrule.rrule(dtstart=start_time, **rrule_params), limit
+            )
+        ]
 
 
-class Occurrence(models.Model):
+def rota_member(related_name):
+    return models.ForeignKey(
+        "auth.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name=related_name,
+    )
+
+
+class BaseOccurrence(models.Model):
+    """The fields and display helpers shared by live and archived occurrences."""
+
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     location = models.CharField(max_length=255, blank=True)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(blank=True, null=True)
     all_day = models.BooleanField(default=False)
     details = models.TextField(blank=True)
-    opener = models.ForeignKey(
-        "auth.User",
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name="opener_occurrences",
-    )
-    closer = models.ForeignKey(
-        "auth.User",
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name="closer_occurrences",
-    )
     is_break = models.BooleanField(default=False)
 
+    is_archived = False
+
     class Meta:
+        abstract = True
         ordering = ["start_time"]
 
     def __str__(self):
@@ -129,3 +155,66 @@ class Occurrence(models.Model):
         if open_close:
             details.append("  \n".join(open_close))
         return "\n\n".join(filter(None, details))
+
+
+class Occurrence(BaseOccurrence):
+    opener = rota_member("opener_occurrences")
+    closer = rota_member("closer_occurrences")
+
+    class Meta(BaseOccurrence.Meta):
+        indexes = [models.Index(fields=["start_time", "id"])]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember who was signed up, so a change can refresh their rota feeds.
+        instance._loaded_signups = {
+            getattr(instance, field)
+            for field in ("opener_id", "closer_id")
+            if field in instance.__dict__
+        }
+        return instance
+
+
+class ArchivedOccurrence(BaseOccurrence):
+    """
+    A past occurrence moved out of the live table by ``manage.py
+    archiveoccurrences``. It keeps its original id, so links to it still
+    work, and is only read when someone looks back at the history.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    opener = rota_member("+")
+    closer = rota_member("+")
+
+    is_archived = True
+
+    class Meta(BaseOccurrence.Meta):
+        indexes = [models.Index(fields=["start_time", "id"])]
+
+
+def new_rota_token():
+    return secrets.token_urlsafe(32)
+
+
+class RotaFeedToken(models.Model):
+    """
+    The secret in a member's personal rota feed URL. Calendar apps can't
+    log in, so the token is the credential; resetting it revokes the old URL.
+    """
+
+    user = models.OneToOneField(
+        "auth.User", on_delete=models.CASCADE, related_name="rota_feed_token"
+    )
+    token = models.CharField(max_length=64, unique=True, default=new_rota_token)
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rota feed for {self.user}"
+
+    def get_absolute_url(self):
+        return reverse("rota-feed", args=[self.token])
+
+    def reset(self):
+        self.token = new_rota_token()
+        self.save(update_fields=["token", "created_at"])
@@ -0,0 +1,48 @@
+"""
+Cached payloads for the members' personal rota feeds.
+
+Calendar apps poll the feed often and it rarely changes, so the rendered
+calendar is cached per member until one of their sign-ups changes. Other
+processes only see that if they share the cache (see ``CACHE_URL``), so the
+entries also expire after ``CACHE_TIMEOUT``.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from events.models import Occurrence
+
+
+def _feed_key(user_id):
+    return f"events:rota-feed:{user_id}"
+
+
+def get_cached_feed(user_id):
+    """Return the cached ``(etag, content)`` for a member's feed, or None."""
+    return cache.get(_feed_key(user_id))
+
+
+def set_cached_feed(user_id, content):
+    etag = f'"{hashlib.md5(content).hexdigest()}"'
+    cache.set(_feed_key(user_id), (etag, content))
+    return etag
+
+
+def invalidate_rota_feeds(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        cache.delete_many([_feed_key(user_id) for user_id in user_ids])
+
+
+def signed_up_users(occurrences):
+    """Return the ids of everyone opening or closing any of ``occurrences``."""
+    rows = occurrences.filter(
+        Q(opener__isnull=False) | Q(closer__isnull=False)
+    ).values_list("opener_id", "closer_id")
+    return {user_id for row in rows for user_id in row}
+
+
+def invalidate_event_rota_feeds(event):
+    invalidate_rota_feeds(signed_up_users(Occurrence.objects.filter(event=event)))
@@ -0,0 +1,54 @@
+"""
+Checking new occurrences against the calendar before they're created.
+"""
+
+from django.db.models import Q
+
+from events.models import Occurrence
+
+
+def span(occurrence):
+    return occurrence.start_time, occurrence.end_time or occurrence.start_time
+
+
+def overlaps(a, b):
+    (a_start, a_end), (b_start, b_end) = span(a), span(b)
+    return a_start == b_start or (a_start < b_end and b_start < a_end)
+
+
+def find_overlaps(candidates):
+    """
+    Return ``(candidate, existing)`` pairs for each unsaved candidate that
+    overlaps an occurrence already in the calendar. Breaks don't count.
+
+    The existing occurrences in the candidates' overall range are loaded in
+    one query, then both lists are swept in start order, so each candidate
+    is only compared with the occurrences still running when it starts.
+    """
+    if not candidates:
+        return []
+    first = min(c.start_time for c in candidates)
+    last = max(span(c)[1] for c in candidates)
+    existing = (
+        Occurrence.objects.filter(start_time__lt=last, is_break=False)
+        .filter(Q(end_time__gt=first) | Q(end_time__isnull=True, start_time__gte=first))
+        .select_related("event")
+    )
+
+    items = sorted(
+        [(c.start_time, True, c) for c in candidates]
+        + [(o.start_time, False, o) for o in existing],
+        key=lambda item: (item[0], item[1]),
+    )
+    active = {True: [], False: []}
+    found = []
+    for start, is_candidate, occurrence in items:
+        for group in active.values():
+            group[:] = [o for o in group if overlaps(o, occurrence)]
+        others = active[not is_candidate]
+        found += [
+            (occurrence, other) if is_candidate else (other, occurrence)
+            for other in others
+        ]
+        active[is_candidate].append(occurrence)
+    return sorted(found, key=lambda pair: (pair[0].start_time, pair[1].start_time))
@@ -1,17 +1,50 @@
 import calendar
-import itertools
+import functools
+from collections import defaultdict
 from datetime import datetime, timedelta
+from operator import attrgetter
+from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+from django.db.models.functions import ExtractDay, TruncDate
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
-from django_ical.views import ICalFeed
 
-from events.models import Event, Occurrence
+from events.models import ArchivedOccurrence, Event, Occurrence, RotaFeedToken
+from events.rota import get_cached_feed, invalidate_rota_feeds, set_cached_feed
+from lhc_sharing.caching import cache_policy
+
+AGENDA_PAGE_SIZE = 30
+
+
+def calendar_occurrences(model=Occurrence):
+    """
+    The occurrences shown on the calendar, with what their rows display.
+    Pass ``ArchivedOccurrence`` for the ones moved out of the live table.
+    """
+    return model.objects.exclude(is_break=True).select_related(
+        "opener", "closer", "event"
+    )
+
+
+def group_by_local(occurrences, attr):
+    """
+    Group occurrences on a local date part worked out by the database, in
+    the site's time zone, so rows near midnight land on the right day
+    across DST changes.
+    """
+    groups = defaultdict(list)
+    for occurrence in occurrences:
+        groups[getattr(occurrence, attr)].append(occurrence)
+    return groups
 
 
 @login_required
-def month_view_notes(request, year, month):
+async def month_view_notes(request, year, month):
     year, month = int(year), int(month)
     cal = calendar.monthcalendar(year, month)
     dtstart = datetime(year, month, 1)
@@ -19,20 +52,38 @@ def month_view_notes(request, year, month):
 
     # TODO Whether to include those occurrences that started in the previous
     # month but end in this month?
-    queryset = Occurrence.objects.exclude(is_break=True).select_related(
-        "opener", "closer", "event"
-    )
-    occurrences = queryset.filter(start_time__year=year, start_time__month=month)
     current_timezone = timezone.get_current_timezone()
-    rehearsals = Event.objects.filter(event_type__label='Rehearsal',
-                                      occurrence__in=occurrences).distinct()
+    month_start = datetime(year, month, 1, tzinfo=current_timezone)
+    month_end = datetime(
+        year + month // 12, month % 12 + 1, 1, tzinfo=current_timezone
+    )
+
+    def month_occurrences(model):
+        return (
+            calendar_occurrences(model)
+            .filter(start_time__gte=month_start, start_time__lt=month_end)
+            .annotate(local_day=ExtractDay("start_time", tzinfo=current_timezone))
+            .order_by("local_day", "start_time")
+        )
 
-    def start_day(o):
-        return o.start_time.astimezone(current_timezone).day
+    live = month_occurrences(Occurrence)
+    occurrences = [o async for o in live]
+    in_month = Q(occurrence__in=live)
+    if month_start < timezone.now():
+        # Only months that have started can have archived occurrences.
+        archived = month_occurrences(ArchivedOccurrence)
+        occurrences = sorted(
+            [*occurrences, *[o async for o in archived]],
+            key=attrgetter("local_day", "start_time"),
+        )
+        in_month |= Q(archivedoccurrence__in=archived)
+    rehearsals = [
+        event async for event in Event.objects.filter(
+            in_month, event_type__label='Rehearsal'
+        ).distinct()
+    ]
 
-    by_day = dict([
-        (dt, list(o)) for dt, o in itertools.groupby(occurrences, start_day)
-    ])
+    by_day = group_by_local(occurrences, "local_day")
     data = {
         "today": timezone.now(),
         "calendar": [[(d, by_day.get(d, [])) for d in row] for row in cal],
@@ -43,45 +94,162 @@ def month_view_notes(request, year, month):
         "rehearsals": rehearsals,
     }
 
-    return render(request, "events/monthly_view.html", data)
+    # Templates may still touch the session, permissions or lazy relations,
+    # so rendering runs in a worker thread rather than on the event loop.
+    return await sync_to_async(render)(request, "events/monthly_view.html", data)
+
+
+def encode_cursor(occurrence):
+    return f"{occurrence.start_time.isoformat()}_{occurrence.id}"
+
+
+def decode_cursor(cursor):
+    start_time, _, pk = cursor.rpartition("_")
+    try:
+        start_time, pk = datetime.fromisoformat(start_time), int(pk)
+    except ValueError:
+        raise BadRequest("Invalid cursor.")
+    if timezone.is_naive(start_time):
+        raise BadRequest("Invalid cursor.")
+    return start_time, pk
+
+
+def keyset_after(start_time, pk, descending=False):
+    """Match the rows that come after ``(start_time, pk)`` in the ordering."""
+    op = "lt" if descending else "gt"
+    if pk is None:
+        return Q(**{f"start_time__{op}e": start_time})
+    return Q(**{f"start_time__{op}": start_time}) | Q(
+        start_time=start_time, **{f"id__{op}": pk}
+    )
 
 
 @login_required
-def event_occurrence(request, event_id, occurrence_id):
-    occurrence = get_object_or_404(
-        Occurrence.objects.select_related("event"),
-        id=occurrence_id, event__id=event_id
+async def agenda(request):
+    """
+    Upcoming (or, with ``?past=1``, past) occurrences as one continuous
+    list. Pages follow a ``(start_time, id)`` keyset cursor instead of an
+    offset, so each page is an index range scan however far the member
+    scrolls, and rows added meanwhile don't shift the pages.
+    """
+    past = request.GET.get("past") == "1"
+    current_timezone = timezone.get_current_timezone()
+    if cursor := request.GET.get("cursor"):
+        start_time, pk = decode_cursor(cursor)
+        continues = timezone.localtime(start_time).date()
+    else:
+        start_time, pk = timezone.now(), None
+        continues = None
+
+    def page(model):
+        queryset = (
+            calendar_occurrences(model)
+            .annotate(local_date=TruncDate("start_time", tzinfo=current_timezone))
+            .filter(keyset_after(start_time, pk, past))
+        )
+        if past:
+            queryset = queryset.order_by("-start_time", "-id")
+        else:
+            queryset = queryset.order_by("start_time", "id")
+        return queryset[:AGENDA_PAGE_SIZE + 1]
+
+    occurrences = [o async for o in page(Occurrence)]
+    if past:
+        # Archived ids are kept from the live table, so the two merge into
+        # one (start_time, id) ordering and the cursor works across both.
+        occurrences = sorted(
+            [*occurrences, *[o async for o in page(ArchivedOccurrence)]],
+            key=attrgetter("start_time", "id"),
+            reverse=True,
+        )[:AGENDA_PAGE_SIZE + 1]
+    next_url = None
+    if len(occurrences) > AGENDA_PAGE_SIZE:
+        occurrences = occurrences[:AGENDA_PAGE_SIZE]
+        query = {"cursor": encode_cursor(occurrences[-1])}
+        if past:
+            query["past"] = "1"
+        next_url = f"{request.path}?{urlencode(query)}"
+
+    data = {
+        "days": list(group_by_local(occurrences, "local_date").items()),
+        # The day the previous page ended on, whose heading is already shown.
+        "continues": continues,
+        "next_url": next_url,
+        "past": past,
+    }
+    template = (
+        "events/agenda_page.html"
+        if request.headers.get("X-Partial")
+        else "events/agenda.html"
     )
-    return render(
+    return await sync_to_async(render)(request, template, data)
+
+
+@login_required
+async def event_occurrence(request, event_id, occurrence_id):
+    for model in (Occurrence, ArchivedOccurrence):
+        occurrence = await model.objects.select_related(
+            "event", "opener", "closer"
+        ).filter(id=occurrence_id, event__id=event_id).afirst()
+        if occurrence is not None:
+            break
+    else:
+        raise Http404("No Occurrence matches the given query.")
+    return await sync_to_async(render)(
         request,
         "events/occurrence.html",
         {"occurrence": occurrence, "event": occurrence.event},
     )
 
 
+def toggle_signup(occurrence_id, event_id, role, user):
+    """
+    Sign ``user`` up for ``role`` if it's free, or cancel their sign-up.
+    Each is a single conditional UPDATE, so two members clicking at once
+    can't overwrite each other.
+    """
+    if role not in ("opener", "closer"):
+        return
+    occurrences = Occurrence.objects.filter(id=occurrence_id, event_id=event_id)
+    if not occurrences.filter(**{f"{role}__isnull": True}).update(**{role: user}):
+        occurrences.filter(**{role: user}).update(**{role: None})
+    # update() doesn't send post_save, so refresh the member's feed here.
+    invalidate_rota_feeds([user.pk])
+
+
+def signup_payload(occurrence, user):
+    data = {"id": occurrence.id}
+    for role in ("opener", "closer"):
+        member = getattr(occurrence, role)
+        data[role] = {
+            "name": member.get_full_name() or member.username,
+            "is_me": member == user,
+        } if member else None
+    return data
+
+
 @login_required
 def occurrence_grid_signup(request, event_id):
     if request.method == "POST":
         occurrence_id = request.POST.get("occurrence_id")
-        role = request.POST.get("role")  # 'opener' or 'closer'
-
-        try:
-            occurrence = Occurrence.objects.get(id=occurrence_id)
-            if role == "opener":
-                if occurrence.opener is None:
-                    occurrence.opener = request.user
-                elif occurrence.opener == request.user:
-                    occurrence.opener = None
-                occurrence.save()
-            elif role == "closer":
-                if occurrence.closer is None:
-                    occurrence.closer = request.user
-                elif occurrence.closer == request.user:
-                    occurrence.closer = None
-                occurrence.save()
-        except Occurrence.DoesNotExist:
-            pass
+        toggle_signup(
+            occurrence_id, event_id, request.POST.get("role"), request.user
+        )
 
+        # The grid's script asks for just the changed row (or JSON) and
+        # updates the table in place, instead of following the redirect.
+        accept = request.headers.get("Accept", "")
+        if "application/json" in accept or request.headers.get("X-Partial"):
+            occurrence = get_object_or_404(
+                Occurrence.objects.select_related("opener", "closer"),
+                id=occurrence_id,
+                event_id=event_id,
+            )
+            if "application/json" in accept:
+                return JsonResponse(signup_payload(occurrence, request.user))
+            return render(
+                request, "events/occurrence_grid_row.html", {"occ": occurrence}
+            )
         return redirect("occurrence_signup_grid", event_id=event_id)
 
     event = Event.objects.get(id=event_id)
@@ -110,30 +278,72 @@ def occurrence_printable_schedule(request, event_id):
     )
 
 
-class EventFeed(ICalFeed):
-    """
-    A simple event calender
-    """
-    product_id = '-//LHC Members//Events//EN'
-    timezone = 'UTC'
-    title = "London Humanist Choir Events"
-    # file_name = "event.ics"
+@functools.cache
+def _event_feed():
+    # django_ical is only needed for the feed, so it's imported on first use.
+    from events.feeds import EventFeed
+
+    return EventFeed()
 
-    def items(self):
-        return Occurrence.objects.all().order_by('-start_time').select_related()
 
-    def item_title(self, item):
-        return item.event.title
+@cache_policy("feed")
+async def event_feed(request):
+    return await _event_feed()(request)
 
-    def item_description(self, item):
-        all_details = "\n\n".join(filter(None, [item.event.details, item.details]))
-        return all_details.replace('**', '')  # Remove markdown bold for iCal
 
-    def item_end_datetime(self, item):
-        return item.end_time
+@functools.cache
+def _rota_feed():
+    from events.feeds import RotaFeed
 
-    def item_start_datetime(self, item):
-        return item.start_time
+    return RotaFeed()
 
-    def item_location(self, item):
-        return item.location
+
+async def rota_feed(request, token):
+    """
+    A member's personal calendar of the slots they're opening or closing.
+    The URL's token stands in for a login, and the rendered calendar is
+    cached until their sign-ups change.
+    """
+    try:
+        feed_token = await RotaFeedToken.objects.aget(token=token)
+    except RotaFeedToken.DoesNotExist:
+        raise Http404("Unknown rota feed.")
+    user_id = feed_token.user_id
+
+    if cached := await sync_to_async(get_cached_feed)(user_id):
+        etag, content = cached
+    else:
+        response = await _rota_feed()(request, user_id=user_id)
+        content = response.content
+        etag = await sync_to_async(set_cached_feed)(user_id, content)
+
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type="text/calendar; charset=utf-8")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@login_required
+def my_rota(request):
+    feed_token, _ = RotaFeedToken.objects.get_or_create(user=request.user)
+    if request.method == "POST":
+        feed_token.reset()
+        return redirect("my-rota")
+    occurrences = (
+        Occurrence.objects.filter(
+            Q(opener=request.user) | Q(closer=request.user),
+            start_time__gte=timezone.now(),
+        )
+        .select_related("event", "opener", "closer")
+    )
+    return render(
+        request,
+        "events/my_rota.html",
+        {
+            "feed_url": request.build_absolute_uri(feed_token.get_absolute_url()),
+            "occurrences": occurrences,
+        },
+    )
@@ -0,0 +1,125 @@
+"""
+HTTP caching policy for the CDN in front of the app.
+
+Views choose a policy with the ``cache_policy`` decorator, and
+``CachePolicyMiddleware`` turns it into ``Cache-Control`` and ``Vary``
+headers once every other middleware has had its say. Responses without a
+policy are ``private``, so the CDN only ever stores pages that opted in.
+
+A shared policy is downgraded to ``private`` when the request carries a
+session (the page may be personalised) or the response sets a cookie.
+
+When the models behind a page change, ``purge_paths`` asks the
+``CACHE_PURGER`` backend to evict it. The default backend does nothing, and
+there's no backend for Vercel yet. So pages are only kept at the edge for a
+few minutes, and a stale copy is served while the CDN fetches a fresh one.
+That bounds how long an edit takes to show. It also bounds the damage if
+the CDN ignores ``Vary: Cookie`` and shows a member an anonymous page.
+"""
+
+import functools
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CACHE_POLICIES = {
+    # Anonymous pages that only change when an admin edits them.
+    "public": {
+        "public": True,
+        "max_age": 300,
+        "s_maxage": 300,
+        "stale_while_revalidate": 3600,
+    },
+    # The public calendar feed, which calendar apps poll.
+    "feed": {"public": True, "max_age": 300, "s_maxage": 900},
+    "private": {"private": True, "no_cache": True},
+}
+
+
+def cache_policy(name):
+    """Mark a view's responses with one of the ``CACHE_POLICIES``."""
+    if name not in CACHE_POLICIES:
+        raise ValueError(f"Unknown cache policy {name!r}")
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            async def wrapper(request, *args, **kwargs):
+                response = await view(request, *args, **kwargs)
+                response.cache_policy = name
+                return response
+
+            markcoroutinefunction(wrapper)
+        else:
+            def wrapper(request, *args, **kwargs):
+                response = view(request, *args, **kwargs)
+                response.cache_policy = name
+                return response
+
+        return functools.wraps(view)(wrapper)
+
+    return decorator
+
+
+def is_shareable(request, response):
+    return (
+        request.method in ("GET", "HEAD")
+        and response.status_code == 200
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and not response.cookies
+    )
+
+
+class CachePolicyMiddleware(MiddlewareMixin):
+    """
+    Apply the view's cache policy. This goes above the session, CSRF and
+    messages middleware so it can see any cookies they set.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header("Cache-Control"):
+            return response
+        name = getattr(response, "cache_policy", "private")
+        if not is_shareable(request, response):
+            name = "private"
+        patch_cache_control(response, **CACHE_POLICIES[name])
+        patch_vary_headers(response, ["Cookie"])
+        return response
+
+
+class CachePurger:
+    def purge(self, paths):
+        """Evict the given URL paths from the CDN."""
+        raise NotImplementedError
+
+
+class NoopCachePurger(CachePurger):
+    def purge(self, paths):
+        logger.debug("Not purging %s", ", ".join(paths))
+
+
+@functools.cache
+def get_cache_purger():
+    config = settings.CACHE_PURGER
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_cache_purger(setting, **kwargs):
+    if setting == "CACHE_PURGER":
+        get_cache_purger.cache_clear()
+
+
+def purge_paths(paths):
+    """Purge the paths once the current transaction has committed."""
+    paths = sorted(set(paths))
+    if paths:
+        transaction.on_commit(lambda: get_cache_purger().purge(paths))
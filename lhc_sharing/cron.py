@@ -0,0 +1,35 @@
+"""
+Running management commands on a schedule, for hosts without a shell.
+
+Vercel's cron jobs (see ``vercel.json``), and Cloud Scheduler jobs for the
+container (see the ``Dockerfile``), request ``/cron/<command>/`` with
+``Authorization: Bearer <CRON_SECRET>``. Only the commands in
+``CRON_COMMANDS`` can be run, with the options given there, and the
+endpoint doesn't exist unless ``CRON_SECRET`` is set.
+"""
+
+import contextvars
+import io
+
+from django.conf import settings
+from django.core.management import call_command
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+
+def run_command(request, command):
+    if not settings.CRON_SECRET or command not in settings.CRON_COMMANDS:
+        raise Http404
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.CRON_SECRET}"
+    ):
+        return HttpResponseForbidden()
+    output = io.StringIO()
+    # Run the command outside the request's context, as it would run from a
+    # shell, so nothing scoped to the request applies to it. The repeated-
+    # query check would otherwise flag the task runner, which claims each
+    # task with its own UPDATE on purpose.
+    contextvars.Context().run(
+        call_command, command, stdout=output, **settings.CRON_COMMANDS[command]
+    )
+    return HttpResponse(output.getvalue(), content_type="text/plain")
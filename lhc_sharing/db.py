@@ -0,0 +1,103 @@
+"""
+Routing reads to a database replica.
+
+When ``REPLICA_DATABASE_URL`` is set, ``ReplicaRouter`` sends the reads made
+while handling a request to the ``replica`` alias, and everything else to
+the primary. The replica may lag behind, so once a request writes, that
+browser's reads stay on the primary for ``REPLICA_PIN_SECONDS``: the rest
+of the request by a flag, and the requests after it by a cookie.
+
+Reads outside ``replica_middleware`` (management commands, including those
+run from ``/cron/``, the task runner, tests) and inside transactions always
+use the primary. So does ``DatabaseCache``: a lagging replica would serve
+entries that were just deleted, and its writes don't pin the browser.
+"""
+
+import contextvars
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+REPLICA_DB_ALIAS = "replica"
+PIN_COOKIE = "use_primary"
+# The app label of DatabaseCache's table.
+CACHE_APP_LABEL = "django_cache"
+
+
+@dataclass
+class RequestRouting:
+    use_primary: bool = False
+    wrote: bool = False
+
+
+_routing = contextvars.ContextVar("routing", default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None
+            or routing.use_primary
+            or model._meta.app_label == CACHE_APP_LABEL
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+        if routing := _routing.get():
+            # Read our own writes for the rest of the request.
+            routing.use_primary = routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """
+    Track the database routing for each request. This goes above the
+    session middleware, so loading the session is routed too.
+    """
+
+    def start(request):
+        return _routing.set(
+            RequestRouting(use_primary=PIN_COOKIE in request.COOKIES)
+        )
+
+    def finish(token, response):
+        routing = _routing.get()
+        _routing.reset(token)
+        if routing.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start(request)
+            return finish(token, await get_response(request))
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            token = start(request)
+            return finish(token, get_response(request))
+
+    return middleware
@@ -0,0 +1,86 @@
+"""
+Measure what a cold start imports, using ``python -X importtime``.
+
+A cold start is a fresh interpreter loading the WSGI application and the
+URLconf, which is what Vercel does before serving the first request.
+"""
+
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+# What matters is catching a heavy library creeping back into startup.
+STARTUP_BUDGET_MS = 1000
+
+# Libraries that are only needed by some requests and should be imported
+# on first use. sentry_sdk isn't one: it has to be set up at startup to
+# report errors from the first request on.
+DEFERRED_MODULES = [
+    "dateutil.rrule",
+    "django_ical",
+    "mailchimp_marketing",
+    "markdown",
+]
+
+STARTUP_CODE = f"""
+import sys
+import lhc_sharing.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(",".join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))
+"""
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class Report:
+    def __init__(self, modules, loaded_deferred):
+        # (name, self µs, cumulative µs, depth) in import order
+        self.modules = modules
+        self.loaded_deferred = loaded_deferred
+
+    @property
+    def total_ms(self):
+        return sum(us for _, us, _, _ in self.modules) / 1000
+
+    def by_package(self):
+        """Return ``[(package, ms)]`` of self time, largest first."""
+        totals = defaultdict(int)
+        for name, us, _, _ in self.modules:
+            totals[name.split(".")[0]] += us
+        return sorted(
+            ((package, us / 1000) for package, us in totals.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def top_level(self):
+        """Return ``[(module, ms)]`` of cumulative time for the direct imports."""
+        return sorted(
+            ((name, us / 1000) for name, _, us, depth in self.modules if depth == 0),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+
+def measure_startup():
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("DJANGO_SETTINGS_MODULE", "lhc_sharing.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if match := LINE_RE.match(line):
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append(
+                (name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+            )
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return Report(modules, loaded)
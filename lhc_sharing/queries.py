@@ -0,0 +1,199 @@
+"""
+Spotting N+1 queries.
+
+Properties such as ``Occurrence.title`` quietly run a query per object when
+the queryset behind a page is missing a ``select_related``.
+``repeated_query_middleware`` records the SQL each watched request runs,
+reduced to a fingerprint with the parameters taken out, and where in the
+templates and code it came from. Any fingerprint run from the same place
+``REPEATED_QUERY_THRESHOLD`` times or more is reported.
+
+The tests set ``REPEATED_QUERY_RAISE`` so reports become errors. Otherwise
+they're logged, and sent to Sentry when it's configured, for every request
+when ``DEBUG`` is on and for ``REPEATED_QUERY_SAMPLE_RATE`` of them in
+production.
+"""
+
+import contextvars
+import logging
+import random
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+_recorder = contextvars.ContextVar("query_recorder", default=None)
+
+_IN_LIST = re.compile(r"\bIN \((?:%s, )*%s\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """The shape of a query, so the same query with other values matches."""
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _LITERAL.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class RepeatedQueriesError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class RepeatedQuery:
+    fingerprint: str
+    location: str
+    count: int
+
+    def __str__(self):
+        return f"{self.count} × {self.fingerprint}\n  from {self.location}"
+
+
+def _project_path(filename):
+    path = Path(filename)
+    return (
+        path.is_relative_to(settings.BASE_DIR)
+        and "site-packages" not in path.parts
+        and path != Path(__file__)
+    )
+
+
+def query_location(frame):
+    """
+    Describe where a query came from: the innermost template node being
+    rendered, if any, and the innermost line of the project's own code.
+    """
+    # Only the watched requests pay for loading the template machinery.
+    from django.template.base import Node
+
+    render_annotated = Node.render_annotated.__code__
+    template = code = None
+    while frame and not (template and code):
+        if template is None and frame.f_code is render_annotated:
+            node = frame.f_locals["self"]
+            if node.origin and node.token:
+                template = f"{node.origin.template_name}:{node.token.lineno}"
+        elif code is None and _project_path(frame.f_code.co_filename):
+            path = Path(frame.f_code.co_filename).relative_to(settings.BASE_DIR)
+            code = f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return ", ".join(filter(None, [template, code])) or "unknown"
+
+
+class QueryRecorder:
+    """A database execute wrapper counting the queries run in a request."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql), query_location(sys._getframe(1))
+        self.counts[key] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return [
+            RepeatedQuery(sql, location, count)
+            for (sql, location), count in self.counts.most_common()
+            if count >= threshold
+        ]
+
+
+def _watch_request():
+    if settings.REPEATED_QUERY_RAISE or settings.DEBUG:
+        return True
+    return random.random() < settings.REPEATED_QUERY_SAMPLE_RATE
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    if recorder := _recorder.get():
+        return recorder(execute, sql, params, many, context)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_wrapper(sender, connection, **kwargs):
+    """
+    Add the wrapper to every connection as it's opened, in whichever thread
+    opens it. Async views query from ``sync_to_async`` threads, so the
+    middleware can't reach their connections itself. The wrapper does
+    nothing outside a watched request.
+    """
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def report(request, repeated):
+    summary = (
+        f"{len(repeated)} repeated "
+        f"quer{'y' if len(repeated) == 1 else 'ies'} in {request.path}"
+    )
+    details = "\n".join(str(query) for query in repeated)
+    if settings.REPEATED_QUERY_RAISE:
+        raise RepeatedQueriesError(f"{summary}\n{details}")
+    logger.warning("%s\n%s", summary, details)
+    if settings.SENTRY_DSN:
+        import sentry_sdk
+
+        for query in repeated:
+            with sentry_sdk.new_scope() as scope:
+                # One Sentry issue for each query and place it comes from.
+                scope.fingerprint = [
+                    "repeated-query", query.fingerprint, query.location
+                ]
+                scope.set_context("repeated_query", {
+                    "sql": query.fingerprint,
+                    "location": query.location,
+                    "count": query.count,
+                })
+                sentry_sdk.capture_message(
+                    f"Repeated query from {query.location}", level="warning"
+                )
+
+
+@sync_and_async_middleware
+def repeated_query_middleware(get_response):
+    # Connections this thread opened before the receiver was connected.
+    for connection in connections.all(initialized_only=True):
+        install_wrapper(None, connection)
+
+    def start(request):
+        if not _watch_request():
+            return None
+        return _recorder.set(QueryRecorder())
+
+    def finish(token, request):
+        recorder = _recorder.get()
+        _recorder.reset(token)
+        if repeated := recorder.repeated(settings.REPEATED_QUERY_THRESHOLD):
+            report(request, repeated)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start(request)
+            response = await get_response(request)
+            if token:
+                finish(token, request)
+            return response
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            token = start(request)
+            response = get_response(request)
+            if token:
+                finish(token, request)
+            return response
+
+    return middleware
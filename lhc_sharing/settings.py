@@ -15,8 +15,7 @@ import os
 from pathlib import Path
 
 import environ
-import sentry_sdk
-from google.oauth2 import service_account
+from django.utils.functional import SimpleLazyObject
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,11 +52,16 @@ INSTALLED_APPS = [
     "invitations",
     "music",
     "events",
+    "tasks",
 ]
 
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "lhc_sharing.queries.repeated_query_middleware",
+    "lhc_sharing.caching.CachePolicyMiddleware",
+    "lhc_sharing.db.replica_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -97,6 +101,48 @@ WSGI_APPLICATION = "lhc_sharing.wsgi.application"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 DATABASES = {"default": env.db()}
 
+# Reads made by requests go to the replica, if there is one. See
+# lhc_sharing.db.
+if env("REPLICA_DATABASE_URL", default=None):
+    DATABASES["replica"] = {
+        **env.db("REPLICA_DATABASE_URL"),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["lhc_sharing.db.ReplicaRouter"]
+# How long a member's reads stay on the primary after they write, to cover
+# the replication lag.
+REPLICA_PIN_SECONDS = 10
+
+# Scheduled management commands, run by requesting /cron/<command>/ with
+# this secret as a bearer token. See lhc_sharing.cron.
+CRON_SECRET = env("CRON_SECRET", default="")
+CRON_COMMANDS = {
+    "runtasks": {"once": True},
+    "syncmailinglist": {},
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Pages and feeds are cached until the models behind them change, and a
+# change only clears the cache it was made in. Set CACHE_URL to a cache that
+# every instance shares, e.g. dbcache://django_cache (after running
+# createcachetable) or redis://. Entries also expire after CACHE_TIMEOUT
+# seconds, which bounds how stale a per-process cache can get.
+CACHES = {
+    "default": {
+        **env.cache("CACHE_URL", default="locmemcache://"),
+        "TIMEOUT": env.int("CACHE_TIMEOUT", default=300),
+    }
+}
+
+# Report a query run this many times from the same place in one request,
+# which is usually a missing select_related. See lhc_sharing.queries.
+REPEATED_QUERY_THRESHOLD = 5
+# The share of production requests checked; all are checked when DEBUG.
+REPEATED_QUERY_SAMPLE_RATE = env.float("REPEATED_QUERY_SAMPLE_RATE", default=0.01)
+# Raise instead of logging, for the tests.
+REPEATED_QUERY_RAISE = False
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -160,16 +206,56 @@ STATIC_ROOT = "static_root/static"
 MEDIA_ROOT = "media/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# collectstatic writes content-hashed copies of every file plus gzip and
+# brotli variants; WhiteNoise serves the hashed names with far-future
+# immutable cache headers when the site runs under gunicorn. On Vercel the
+# CDN serves them, and vercel.json bundles the manifest with the function.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# Evicts pages from the CDN when the content behind them changes. See
+# lhc_sharing.caching.
+CACHE_PURGER = {
+    "BACKEND": env(
+        "CACHE_PURGER_BACKEND", default="lhc_sharing.caching.NoopCachePurger"
+    ),
+}
+
 BUCKET_NAME = "london-humanist-choir"
 
-if creds := env("GS_ACCOUNT_FILE"):
-    GS_CREDENTIALS = service_account.Credentials.from_service_account_file(creds)
-elif creds := env("GS_ACCOUNT_JSON"):
-    GS_CREDENTIALS = service_account.Credentials.from_service_account_info(
-        json.loads(creds)
+# Where song files are served from: music.storage.GCSSongStorage (the
+# bucket), LocalSongStorage (a mirror in SONG_FILES_ROOT) or
+# MemorySongStorage (tests).
+SONG_STORAGE = {
+    "BACKEND": env("SONG_STORAGE_BACKEND", default="music.storage.GCSSongStorage"),
+}
+SONG_FILES_ROOT = env("SONG_FILES_ROOT", default=str(BASE_DIR / "song_files"))
+
+GS_ACCOUNT_FILE = env("GS_ACCOUNT_FILE")
+GS_ACCOUNT_JSON = env("GS_ACCOUNT_JSON")
+
+
+def load_gs_credentials():
+    from google.oauth2 import service_account
+
+    if GS_ACCOUNT_FILE:
+        return service_account.Credentials.from_service_account_file(GS_ACCOUNT_FILE)
+    return service_account.Credentials.from_service_account_info(
+        json.loads(GS_ACCOUNT_JSON)
     )
 
 
+# Loading the key pulls in the crypto libraries, so it waits until Cloud
+# Storage is first used rather than slowing down every cold start.
+GS_CREDENTIALS = SimpleLazyObject(load_gs_credentials)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -184,6 +270,12 @@ GMAIL_API_REFRESH_TOKEN = env("GMAIL_API_REFRESH_TOKEN")
 MAILCHIMP_SERVER_PREFIX = "us2"
 MAILCHIMP_API_KEY = env("MAILCHIMP_API_KEY")
 MAILCHIMP_LIST_ID = "34e00f11a4"
+# Overrides the API address, e.g. to point at a stub server.
+MAILCHIMP_API_URL = env("MAILCHIMP_API_URL", default=None)
+
+# Overrides the oEmbed endpoint used for every embed provider, e.g. to point
+# at a stub server. See music.embeds.
+OEMBED_API_URL = env("OEMBED_API_URL", default=None)
 
 
 LOGGING = {
@@ -205,7 +297,15 @@ LOGGING = {
 
 SITE_ID = 1
 
-sentry_sdk.init(
-    dsn=env("SENTRY_DSN"),
-    send_default_pii=True,
-)
+if SENTRY_DSN := env("SENTRY_DSN", default=""):
+    import sentry_sdk
+    from sentry_sdk.integrations.django import DjangoIntegration
+
+    # Only the Django integration: the auto-enabled ones import every
+    # supported library that happens to be installed.
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        send_default_pii=True,
+        auto_enabling_integrations=False,
+        integrations=[DjangoIntegration()],
+    )
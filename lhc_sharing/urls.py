@@ -22,6 +22,7 @@ from django.contrib.auth.decorators import login_required
 from django.urls import include, path, re_path, reverse_lazy
 
 from events import views as events_views
+from lhc_sharing import cron
 from music import views
 
 urlpatterns = [
@@ -39,12 +40,21 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("songs", views.CurrentMusicList.as_view(), name="songs"),
     path("all-songs", views.MusicList.as_view(), name="all_songs"),
+    path("songs/search", views.song_search, name="song_search"),
     path("song/<str:slug>", views.MusicDetail.as_view(), name="song_detail"),
+    path("song/<str:slug>/file/<int:file_id>", views.song_file, name="song_file"),
+    path(
+        "song/<str:slug>/preview/<int:file_id>",
+        views.song_file,
+        {"disposition": "inline"},
+        name="song_file_preview",
+    ),
     re_path(
         r"^calendar/(\d{4})/(0?[1-9]|1[012])/$",
         events_views.month_view_notes,
         name="event-monthly-view",
     ),
+    path("calendar/agenda/", events_views.agenda, name="event-agenda"),
     path(
         "calendar/occurrence/<int:event_id>/<int:occurrence_id>/",
         events_views.event_occurrence,
@@ -60,6 +70,15 @@ urlpatterns = [
         events_views.occurrence_printable_schedule,
         name="occurrence_printable_schedule",
     ),
-    path("events/feed.ics", events_views.EventFeed(), name="event-feed"),
-    path("", include("django.contrib.flatpages.urls")),
+    path("events/feed.ics", events_views.event_feed, name="event-feed"),
+    path("events/rota/", events_views.my_rota, name="my-rota"),
+    path(
+        "events/rota/<str:token>.ics", events_views.rota_feed, name="rota-feed"
+    ),
+    path("cron/<str:command>/", cron.run_command, name="cron"),
+    path(
+        "<path:url>",
+        views.flatpage,
+        name="django.contrib.flatpages.views.flatpage",
+    ),
 ]
@@ -1,20 +1,30 @@
 from direct_cloud_upload import CloudFileWidget, DdcuAdminMixin
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.flatpages.admin import FlatPageAdmin
 from django.contrib.flatpages.models import FlatPage
+from django.utils.translation import ngettext
 from invitations.admin import InvitationAdmin
 from invitations.models import Invitation
 
-from music.models import DDCU_BUCKET_IDENTIFIER, Song
+from music.invitations import send_invitations
+from music.models import DDCU_BUCKET_IDENTIFIER, MailingListConsent, Song
 
 
 class SongForm(forms.ModelForm):
     class Meta:
         model = Song
         fields = ["name", "slug", "created_at", "current", "files", "embed"]
+        help_texts = {
+            "embed": (
+                "A YouTube or MuseScore link for the song, or its embed code. "
+                "Embed codes from other sites are shown as they are, without "
+                "the click-to-play thumbnail."
+            ),
+        }
 
         widgets = {
+            "embed": forms.Textarea(attrs={"rows": 3}),
             "files": CloudFileWidget(
                 bucket_identifier=DDCU_BUCKET_IDENTIFIER,
                 path_prefix="media/",
@@ -23,6 +33,9 @@ class SongForm(forms.ModelForm):
             )
         }
 
+    def clean_embed(self):
+        return self.cleaned_data["embed"].strip()
+
 
 @admin.register(Song)
 class SongAdmin(DdcuAdminMixin):
@@ -34,6 +47,13 @@ class SongAdmin(DdcuAdminMixin):
     prepopulated_fields = {"slug": ["name"]}
 
 
+@admin.register(MailingListConsent)
+class MailingListConsentAdmin(admin.ModelAdmin):
+    list_display = ("user", "consented_at", "synced_at")
+    list_select_related = ("user",)
+    search_fields = ("user__email", "user__first_name", "user__last_name")
+
+
 admin.site.unregister(FlatPage)
 admin.site.unregister(Invitation)
 
@@ -53,10 +73,22 @@ class ResendInvitationAdmin(InvitationAdmin):
 
     @admin.action(description="Resend invitation")
     def resend_invitation(self, request, queryset):
-        for invitation in queryset:
-            invitation.send_invitation(request)
-        num = queryset.count()
+        sent, failed = send_invitations(
+            queryset.select_related("inviter"), request
+        )
+        num = len(sent)
         self.message_user(
             request,
-            f"{num} invitation{'' if num == 1 else 's'} have been resent."
+            ngettext(
+                "%(num)d invitation has been resent.",
+                "%(num)d invitations have been resent.",
+                num,
+            ) % {"num": num},
         )
+        if failed:
+            self.message_user(
+                request,
+                "Couldn't send to: "
+                + ", ".join(f"{email} ({error})" for email, error in failed.items()),
+                messages.ERROR,
+            )
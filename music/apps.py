@@ -1,5 +1,11 @@
 from django.apps import AppConfig
-from django.core.mail import mail_admins
+from django.db import connections
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+)
 from django.dispatch import receiver
 from invitations.signals import invite_accepted
 
@@ -11,8 +17,34 @@ class MusicConfig(AppConfig):
 
 @receiver(invite_accepted)
 def handle_invite_accepted(sender, email, **kwargs):
-    mail_admins(
-        "Invitation accepted",
-        f"Invitation accepted by {email}",
-        fail_silently=True,
-    )
+    from music.tasks import notify_invite_accepted
+
+    notify_invite_accepted.enqueue(email)
+
+
+@receiver(post_save, sender="flatpages.FlatPage")
+@receiver(post_delete, sender="flatpages.FlatPage")
+def handle_flatpage_changed(sender, instance, **kwargs):
+    from music.flatpages import invalidate_flatpages
+
+    invalidate_flatpages(instance)
+
+
+@receiver(m2m_changed, sender="flatpages.FlatPage_sites")
+def handle_flatpage_sites_changed(sender, instance, **kwargs):
+    from music.flatpages import invalidate_flatpages
+
+    invalidate_flatpages()
+
+
+@receiver(post_migrate)
+def handle_post_migrate(sender, using, **kwargs):
+    # SQLite migrations rebuild music_song by copying it to a new table,
+    # which drops the triggers that keep the search index up to date.
+    connection = connections[using]
+    if sender.name != "music" or connection.vendor != "sqlite":
+        return
+    if "music_song" in connection.introspection.table_names():
+        from music.search import create_search_index
+
+        create_search_index(connection)
@@ -0,0 +1,74 @@
+"""
+Third-party players shown on song pages.
+
+The admin pastes a link or embed code into ``Song.embed``, and it's parsed
+into a provider and id. Song pages show a thumbnail in place of the player,
+and the provider's iframe and scripts only load when a member clicks it.
+The title and thumbnail come from the provider's oEmbed endpoint, fetched
+once by a task when the embed changes.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+
+@dataclass(frozen=True)
+class EmbedProvider:
+    label: str
+    pattern: re.Pattern
+    embed_url: str
+    page_url: str
+    oembed_url: str
+    # Used until the oEmbed thumbnail has been fetched.
+    default_thumbnail_url: str = ""
+
+
+PROVIDERS = {
+    "youtube": EmbedProvider(
+        label="YouTube",
+        pattern=re.compile(
+            r"(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:\S*?&)?v=|embed/|shorts/|live/)"
+            r"|youtu\.be/)(?P<id>[\w-]{11})"
+        ),
+        embed_url="https://www.youtube-nocookie.com/embed/{id}?autoplay=1",
+        page_url="https://www.youtube.com/watch?v={id}",
+        oembed_url="https://www.youtube.com/oembed",
+        default_thumbnail_url="https://i.ytimg.com/vi/{id}/hqdefault.jpg",
+    ),
+    "musescore": EmbedProvider(
+        label="MuseScore",
+        pattern=re.compile(r"musescore\.com/(?P<id>user/\d+/scores/\d+)"),
+        embed_url="https://musescore.com/{id}/embed",
+        page_url="https://musescore.com/{id}",
+        oembed_url="https://musescore.com/oembed/endpoint",
+    ),
+}
+
+PROVIDER_CHOICES = [(name, provider.label) for name, provider in PROVIDERS.items()]
+
+
+def parse_embed(text):
+    """
+    Return the ``(provider, id)`` of the player a link or embed code points
+    at, or None if it isn't from a known provider.
+    """
+    for name, provider in PROVIDERS.items():
+        if match := provider.pattern.search(text):
+            return name, match["id"]
+    return None
+
+
+def fetch_oembed(provider, embed_id):
+    """Fetch the provider's oEmbed data for a player, e.g. its thumbnail."""
+    # Only the task runner needs an HTTP client, so it's imported here.
+    from urllib.request import urlopen
+
+    provider = PROVIDERS[provider]
+    endpoint = settings.OEMBED_API_URL or provider.oembed_url
+    query = urlencode({"url": provider.page_url.format(id=embed_id), "format": "json"})
+    with urlopen(f"{endpoint}?{query}", timeout=10) as response:
+        return json.load(response)
@@ -0,0 +1,90 @@
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+
+from lhc_sharing.caching import purge_paths
+
+
+def _pages_key(site_id):
+    return f"flatpages:pages:{site_id}"
+
+
+def _nav_key(site_id, authenticated):
+    return f"flatpages:nav:{site_id}:{int(authenticated)}"
+
+
+def _content_key(flatpage_id):
+    return f"flatpages:content:{flatpage_id}"
+
+
+def site_flatpages(site_id):
+    """
+    Return a dict mapping url to ``FlatPage`` for every page on the site.
+
+    The mapping is cached until a flat page is changed, or ``CACHE_TIMEOUT``
+    runs out.
+    """
+    key = _pages_key(site_id)
+    pages = cache.get(key)
+    if pages is None:
+        pages = {
+            page.url: page
+            for page in FlatPage.objects.filter(sites__id=site_id).order_by("url")
+        }
+        cache.set(key, pages)
+    return pages
+
+
+def nav_flatpages(site_id, authenticated):
+    """
+    Return the flat pages to list in the navigation bar, matching the
+    behaviour of ``{% get_flatpages for user %}``.
+    """
+    key = _nav_key(site_id, authenticated)
+    pages = cache.get(key)
+    if pages is None:
+        pages = [
+            page
+            for page in site_flatpages(site_id).values()
+            if authenticated or not page.registration_required
+        ]
+        cache.set(key, pages)
+    return pages
+
+
+def markdown_to_html(text):
+    import markdown
+
+    return markdown.markdown(text)
+
+
+def rendered_content(flatpage):
+    """Return the flat page content rendered from markdown to HTML."""
+    key = _content_key(flatpage.pk)
+    content = cache.get(key)
+    if content is None:
+        content = markdown_to_html(flatpage.content)
+        cache.set(key, content)
+    return content
+
+
+def invalidate_flatpages(flatpage=None):
+    """
+    Drop the cached pages, and purge every public page from the CDN since
+    they all show the flat pages in the navigation bar.
+    """
+    keys = []
+    for site_id in Site.objects.values_list("pk", flat=True):
+        keys += [
+            _pages_key(site_id),
+            _nav_key(site_id, True),
+            _nav_key(site_id, False),
+        ]
+    if flatpage is not None:
+        keys.append(_content_key(flatpage.pk))
+    cache.delete_many(keys)
+
+    paths = ["/", *FlatPage.objects.values_list("url", flat=True)]
+    if flatpage is not None:
+        paths.append(flatpage.url)
+    purge_paths(paths)
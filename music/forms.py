@@ -1,11 +1,6 @@
-import json
-import logging
-
-import mailchimp_marketing
 from django import forms
-from django.conf import settings
 
-logger = logging.getLogger(__name__)
+from music.models import MailingListConsent
 
 GDPR_MESSAGE = (
     "I consent to my email address being added to the London Humanist Choir "
@@ -24,23 +19,4 @@ class SignupForm(forms.Form):
     )
 
     def signup(self, request, user):
-        mailchimp = mailchimp_marketing.Client()
-        mailchimp.set_config({
-            "api_key": settings.MAILCHIMP_API_KEY,
-            "server": settings.MAILCHIMP_SERVER_PREFIX,
-        })
-        try:
-            mailchimp.lists.add_list_member(
-                settings.MAILCHIMP_LIST_ID,
-                {
-                    "email_address": user.email,
-                    "status": "subscribed",
-                    "merge_fields": {"FNAME": user.first_name, "LNAME": user.last_name},
-                },
-            )
-        except mailchimp_marketing.api_client.ApiClientError as e:
-            data = json.loads(e.text)
-            if data.get("title") == "Member Exists":
-                logger.info("User %s already in Mailchimp list", user.email)
-            else:
-                logger.exception("Mailchimp API error in signup: %s", data['detail'])
+        MailingListConsent.objects.get_or_create(user=user)
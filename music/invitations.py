@@ -0,0 +1,68 @@
+"""Send many invitation emails at once from the admin."""
+
+import logging
+
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.mail import get_connection
+from django.urls import reverse
+from django.utils import timezone
+from invitations import signals
+from invitations.adapters import get_invitations_adapter
+from invitations.app_settings import app_settings
+from invitations.models import Invitation
+
+logger = logging.getLogger(__name__)
+
+
+def render_invitation(invitation, request, adapter, site):
+    """Render the email Invitation.send_invitation() would send."""
+    invite_url = request.build_absolute_uri(
+        reverse(app_settings.CONFIRMATION_URL_NAME, args=[invitation.key])
+    )
+    context = {
+        "invite_url": invite_url,
+        "site_name": site.name,
+        "email": invitation.email,
+        "key": invitation.key,
+        "inviter": invitation.inviter,
+    }
+    message = adapter.render_mail(
+        "invitations/email/email_invite", invitation.email, context
+    )
+    return message, invite_url
+
+
+def send_invitations(invitations, request):
+    """
+    Send the emails for ``invitations`` over one mail connection and mark the
+    ones that went out as sent with a single UPDATE. Each message is sent on
+    its own, so one bad address doesn't stop the rest. Return the emails that
+    were sent and a dict of the ones that failed with the error.
+    """
+    adapter = get_invitations_adapter()
+    site = get_current_site(request)
+    sent, failed = {}, {}
+    with get_connection() as connection:
+        for invitation in invitations:
+            try:
+                message, invite_url = render_invitation(
+                    invitation, request, adapter, site
+                )
+                connection.send_messages([message])
+            except Exception as e:
+                logger.exception("Couldn't send invitation to %s", invitation.email)
+                failed[invitation.email] = e
+            else:
+                sent[invitation] = invite_url
+
+    now = timezone.now()
+    Invitation.objects.filter(pk__in=[i.pk for i in sent]).update(sent=now)
+    for invitation, invite_url in sent.items():
+        invitation.sent = now
+        signals.invite_url_sent.send(
+            sender=Invitation,
+            instance=invitation,
+            invite_url_sent=invite_url,
+            inviter=invitation.inviter,
+        )
+    return [invitation.email for invitation in sent], failed
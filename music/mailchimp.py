@@ -0,0 +1,130 @@
+"""
+Keep the Mailchimp list in step with the members who consented to it.
+
+Sign-up only records a MailingListConsent. ``manage.py syncmailinglist``
+reads the whole list once, works out which members are missing or have
+changed their name, and sends all the changes as a single batch operation.
+"""
+
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from music.models import MailingListConsent
+
+PAGE_SIZE = 1000
+
+
+@functools.cache
+def get_client():
+    import mailchimp_marketing
+
+    client = mailchimp_marketing.Client()
+    client.set_config({
+        "api_key": settings.MAILCHIMP_API_KEY,
+        "server": settings.MAILCHIMP_SERVER_PREFIX,
+    })
+    if settings.MAILCHIMP_API_URL:
+        client.api_client.host = settings.MAILCHIMP_API_URL
+    return client
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    if setting.startswith("MAILCHIMP_"):
+        get_client.cache_clear()
+
+
+def subscriber_hash(email):
+    return hashlib.md5(email.lower().encode()).hexdigest()
+
+
+def list_members(client, list_id):
+    """Return the list's members as ``{email: (FNAME, LNAME)}``."""
+    members = {}
+    offset = 0
+    while True:
+        page = client.lists.get_list_members_info(
+            list_id,
+            fields=["members.email_address", "members.merge_fields", "total_items"],
+            count=PAGE_SIZE,
+            offset=offset,
+        )
+        for member in page["members"]:
+            merge_fields = member.get("merge_fields", {})
+            members[member["email_address"].lower()] = (
+                merge_fields.get("FNAME", ""),
+                merge_fields.get("LNAME", ""),
+            )
+        offset += PAGE_SIZE
+        if offset >= page["total_items"]:
+            return members
+
+
+def member_operations(list_id, consents, members):
+    """
+    Return the batch operations that bring the list up to date, and the
+    consents they cover. New members are added with an upsert, so a member
+    who is already on the list isn't an error, and members who unsubscribed
+    are never re-subscribed.
+    """
+    operations = []
+    changed = []
+    for consent in consents:
+        user = consent.user
+        names = (user.first_name, user.last_name)
+        current = members.get(user.email.lower())
+        if current == names:
+            continue
+        path = f"/lists/{list_id}/members/{subscriber_hash(user.email)}"
+        merge_fields = {"FNAME": user.first_name, "LNAME": user.last_name}
+        if current is None:
+            body = {
+                "email_address": user.email,
+                "status_if_new": "subscribed",
+                "merge_fields": merge_fields,
+            }
+            operations.append({"method": "PUT", "path": path, "body": json.dumps(body)})
+        else:
+            body = {"merge_fields": merge_fields}
+            operations.append(
+                {"method": "PATCH", "path": path, "body": json.dumps(body)}
+            )
+        changed.append(consent)
+    return operations, changed
+
+
+def sync_mailing_list(consents, client=None, dry_run=False):
+    """
+    Send the changes for ``consents`` to Mailchimp as one batch operation.
+    Return the operations, and the batch Mailchimp started (None if there
+    was nothing to send or ``dry_run`` is set).
+    """
+    client = client or get_client()
+    list_id = settings.MAILCHIMP_LIST_ID
+    members = list_members(client, list_id)
+    operations, changed = member_operations(list_id, consents, members)
+    if not operations or dry_run:
+        return operations, None
+    batch = client.batches.start({"operations": operations})
+    now = timezone.now()
+    for consent in changed:
+        consent.synced_at = now
+    MailingListConsent.objects.bulk_update(changed, ["synced_at"])
+    return operations, batch
+
+
+def wait_for_batch(batch_id, client=None, interval=5, timeout=600):
+    client = client or get_client()
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = client.batches.status(batch_id)
+        if batch["status"] == "finished" or time.monotonic() > deadline:
+            return batch
+        time.sleep(interval)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lhc_sharing.importtime import STARTUP_BUDGET_MS, measure_startup
+
+
+class Command(BaseCommand):
+    help = "Report the import time of a cold start, broken down by package."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Rows to show (default 20)"
+        )
+        parser.add_argument(
+            "--modules",
+            action="store_true",
+            help="Show cumulative time of each top-level import instead",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail if startup is over budget or imports a deferred library",
+        )
+
+    def handle(self, *args, limit, modules, check, **options):
+        report = measure_startup()
+        rows = report.top_level() if modules else report.by_package()
+        for name, ms in rows[:limit]:
+            self.stdout.write(f"{ms:9.1f} ms  {name}")
+        self.stdout.write(
+            f"{report.total_ms:9.1f} ms  total, {len(report.modules)} modules "
+            f"(budget {STARTUP_BUDGET_MS} ms)"
+        )
+        if report.loaded_deferred:
+            self.stdout.write(
+                "Imported at startup but should be deferred: "
+                + ", ".join(report.loaded_deferred)
+            )
+        if check and (
+            report.total_ms > STARTUP_BUDGET_MS or report.loaded_deferred
+        ):
+            raise CommandError("Cold start is over its import budget")
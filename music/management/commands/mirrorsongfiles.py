@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from music.models import SongFile
+from music.storage import GCSSongStorage, LocalSongStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Download song files that are missing from the local mirror used by "
+        "LocalSongStorage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--root", help="Directory to mirror into (default SONG_FILES_ROOT)"
+        )
+
+    def handle(self, *args, root=None, **options):
+        local = LocalSongStorage(root)
+        bucket = GCSSongStorage().bucket
+        paths = SongFile.objects.values_list("path", flat=True).distinct()
+        downloaded = 0
+        for path in paths.iterator():
+            if local.size(path) is not None:
+                continue
+            destination = local.local_path(path)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            partial = destination.with_name(destination.name + ".part")
+            blob = bucket.get_blob(path)
+            if blob is None:
+                self.stderr.write(f"{path} is not in the bucket")
+                continue
+            blob.download_to_filename(partial)
+            partial.replace(destination)
+            downloaded += 1
+            self.stdout.write(f"Downloaded {path}")
+        self.stdout.write(f"{downloaded} files downloaded to {local.root}")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from music.mailchimp import sync_mailing_list, wait_for_batch
+from music.models import MailingListConsent
+
+
+class Command(BaseCommand):
+    help = "Add members who consented to the Mailchimp list, in one batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show the changes without sending them",
+        )
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="Wait for Mailchimp to finish the batch and report errors",
+        )
+
+    def handle(self, *args, dry_run, wait, **options):
+        consents = MailingListConsent.objects.filter(
+            user__is_active=True
+        ).select_related("user")
+        operations, batch = sync_mailing_list(consents, dry_run=dry_run)
+        for operation in operations:
+            self.stdout.write(f"{operation['method']} {operation['path']}")
+        if batch is None:
+            self.stdout.write(f"{len(operations)} changes, nothing sent")
+            return
+        self.stdout.write(f"{len(operations)} changes sent in batch {batch['id']}")
+        if wait:
+            batch = wait_for_batch(batch["id"])
+            self.stdout.write(
+                f"Batch {batch['status']}: {batch['finished_operations']} done, "
+                f"{batch['errored_operations']} errors"
+            )
+            if batch["errored_operations"]:
+                self.stdout.write(f"Error details: {batch['response_body_url']}")
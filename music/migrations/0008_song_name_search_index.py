@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from music.search import create_search_index, drop_search_index
+
+
+def forwards(apps, schema_editor):
+    create_search_index(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0007_song_embed'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:26
+
+import json
+import pathlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_song_files(apps, schema_editor):
+    Song = apps.get_model('music', 'Song')
+    SongFile = apps.get_model('music', 'SongFile')
+    song_files = []
+    for song in Song.objects.exclude(files=''):
+        for path in dict.fromkeys(json.loads(song.files)):
+            pure_path = pathlib.PurePosixPath(path)
+            suffix = pure_path.suffix.lower()
+            rank = '.000' if suffix == '.pdf' else suffix
+            song_files.append(SongFile(
+                song=song,
+                path=path,
+                name=pure_path.name,
+                suffix=suffix,
+                display_name=pure_path.stem.replace('_', ' '),
+                sort_key=f'{rank} {pure_path.name}',
+            ))
+    SongFile.objects.bulk_create(song_files)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0008_song_name_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024)),
+                ('name', models.CharField(max_length=255)),
+                ('suffix', models.CharField(max_length=16)),
+                ('display_name', models.CharField(max_length=255)),
+                ('sort_key', models.CharField(max_length=300)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='song_files', to='music.song')),
+            ],
+            options={
+                'ordering': ['song', 'sort_key'],
+                'constraints': [models.UniqueConstraint(fields=('song', 'path'), name='unique_song_file')],
+            },
+        ),
+        migrations.RunPython(populate_song_files, migrations.RunPython.noop),
+    ]
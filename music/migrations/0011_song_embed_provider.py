@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:00
+
+from django.db import migrations, models
+
+from music.embeds import parse_embed
+
+
+def parse_embeds(apps, schema_editor):
+    Song = apps.get_model('music', 'Song')
+    Task = apps.get_model('tasks', 'Task')
+    for song in Song.objects.exclude(embed=''):
+        parsed = parse_embed(song.embed)
+        if parsed is None:
+            continue
+        song.embed_provider, song.embed_id = parsed
+        song.save(update_fields=['embed_provider', 'embed_id'])
+        Task.objects.create(
+            name='music.tasks.fetch_embed_metadata', args=[song.pk], max_attempts=3
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_mailinglistconsent'),
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='embed_id',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='embed_provider',
+            field=models.CharField(blank=True, choices=[('youtube', 'YouTube'), ('musescore', 'MuseScore')], editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='embed_thumbnail_url',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='embed_title',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='embed',
+            field=models.TextField(blank=True, help_text='A YouTube or MuseScore link for the song, or its embed code'),
+        ),
+        migrations.RunPython(parse_embeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 21:00
+
+from django.db import migrations
+
+
+def queue_file_sizes(apps, schema_editor):
+    Song = apps.get_model('music', 'Song')
+    Task = apps.get_model('tasks', 'Task')
+    Task.objects.bulk_create(
+        Task(name='music.tasks.fill_file_sizes', args=[pk], max_attempts=3)
+        for pk in Song.objects.filter(
+            song_files__size__isnull=True
+        ).distinct().values_list('pk', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_song_embed_provider'),
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_file_sizes, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,38 @@
 import json
+import logging
 import pathlib
-from datetime import timedelta
 
 from direct_cloud_upload import register_gcs_bucket
 from django.conf import settings
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
-from google.cloud import storage
 
-client = storage.Client(credentials=settings.GS_CREDENTIALS)
-gcs_bucket = client.bucket(settings.BUCKET_NAME)
-DDCU_BUCKET_IDENTIFIER = register_gcs_bucket(gcs_bucket)
+from music.embeds import PROVIDER_CHOICES, PROVIDERS, parse_embed
+from music.search import search_songs
+from music.storage import LazyBucket, get_song_storage
+
+logger = logging.getLogger(__name__)
+
+AUDIO_SUFFIXES = (".mp3", ".m4a", ".wav", ".ogg")
+
+DDCU_BUCKET_IDENTIFIER = register_gcs_bucket(LazyBucket(settings.BUCKET_NAME))
+
+
+class SongQuerySet(models.QuerySet):
+    def search(self, query):
+        return search_songs(self, query)
+
+    def with_file_summary(self):
+        return self.annotate(
+            file_count=models.Count("song_files"),
+            pdf_count=models.Count(
+                "song_files", filter=models.Q(song_files__suffix=".pdf")
+            ),
+            audio_count=models.Count(
+                "song_files", filter=models.Q(song_files__suffix__in=AUDIO_SUFFIXES)
+            ),
+        )
 
 
 class Song(models.Model):
@@ -24,8 +45,18 @@ class Song(models.Model):
     files = models.TextField(blank=True)
     embed = models.TextField(
         blank=True,
-        help_text="Embed code for the song, e.g., a YouTube link or MuseScore embed",
+        help_text="A YouTube or MuseScore link for the song, or its embed code",
+    )
+    # Parsed from embed when the song is saved.
+    embed_provider = models.CharField(
+        max_length=20, blank=True, choices=PROVIDER_CHOICES, editable=False
     )
+    embed_id = models.CharField(max_length=255, blank=True, editable=False)
+    # Fetched from the provider's oEmbed endpoint by a task.
+    embed_title = models.CharField(max_length=255, blank=True, editable=False)
+    embed_thumbnail_url = models.URLField(max_length=500, blank=True, editable=False)
+
+    objects = SongQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -33,27 +64,131 @@ class Song(models.Model):
     def get_absolute_url(self):
         return reverse("song_detail", kwargs={"slug": self.slug})
 
+    def save(self, *args, **kwargs):
+        embed_changed = self.parse_embed()
+        super().save(*args, **kwargs)
+        self.sync_files()
+        from music.tasks import fetch_embed_metadata, fill_file_sizes
+
+        if embed_changed and self.embed_provider:
+            fetch_embed_metadata.enqueue(self.pk)
+        if self.song_files.filter(size__isnull=True).exists():
+            fill_file_sizes.enqueue(self.pk)
+
+    def parse_embed(self):
+        """
+        Set the embed provider and id from ``embed``, and return whether
+        they changed. The fetched title and thumbnail are cleared if so.
+        """
+        provider, embed_id = parse_embed(self.embed) or ("", "")
+        if (provider, embed_id) == (self.embed_provider, self.embed_id):
+            return False
+        self.embed_provider, self.embed_id = provider, embed_id
+        self.embed_title = self.embed_thumbnail_url = ""
+        return True
+
+    @property
+    def embed_url(self):
+        provider = PROVIDERS[self.embed_provider]
+        return provider.embed_url.format(id=self.embed_id)
+
     @property
-    def file_urls(self):
-        file_list = json.loads(self.files)
-        files = []
-        for file in file_list:
-            blob = gcs_bucket.blob(file)
-            path = pathlib.Path(file)
-            signed_url = blob.generate_signed_url(
-                response_disposition="attachment", expiration=timedelta(seconds=86400)
-            )
-            data = {"url": signed_url, "path": path}
-            if path.suffix == ".pdf":
-                preview_url = blob.generate_signed_url(
-                    response_disposition="inline", expiration=timedelta(seconds=86400)
-                )
-                data["preview"] = preview_url
-            files.append(data)
-
-        def sorter(item):
-            suffix = '.000' if (suffix := item["path"].suffix) == ".pdf" else suffix
-            return (suffix, item["path"].name)
-
-        files.sort(key=sorter)
-        return files
+    def embed_thumbnail(self):
+        provider = PROVIDERS[self.embed_provider]
+        return self.embed_thumbnail_url or provider.default_thumbnail_url.format(
+            id=self.embed_id
+        )
+
+    def sync_files(self):
+        """
+        Bring the ``SongFile`` rows in line with the JSON list in ``files``,
+        which is what the upload widget edits.
+        """
+        paths = list(dict.fromkeys(json.loads(self.files))) if self.files else []
+        self.song_files.exclude(path__in=paths).delete()
+        existing = set(self.song_files.values_list("path", flat=True))
+        SongFile.objects.bulk_create(
+            SongFile.from_path(self, path) for path in paths if path not in existing
+        )
+
+    def fill_file_sizes(self):
+        """
+        Look up the size of any files that don't have one yet. Saving the
+        song queues this as a task, so the admin doesn't wait on storage.
+        """
+        storage = get_song_storage()
+        for song_file in self.song_files.filter(size__isnull=True):
+            song_file.size = storage.size(song_file.path)
+            if song_file.size is None:
+                logger.warning("File %s not found in storage", song_file.path)
+                continue
+            song_file.save(update_fields=["size"])
+
+
+class SongFile(models.Model):
+    """
+    One file in a song's manifest, with the values the song pages need
+    worked out once when the song is saved.
+    """
+
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="song_files")
+    path = models.CharField(max_length=1024)
+    name = models.CharField(max_length=255)
+    suffix = models.CharField(max_length=16)
+    display_name = models.CharField(max_length=255)
+    sort_key = models.CharField(max_length=300)
+    size = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["song", "sort_key"]
+        constraints = [
+            models.UniqueConstraint(fields=["song", "path"], name="unique_song_file")
+        ]
+
+    def __str__(self):
+        return self.path
+
+    def get_absolute_url(self):
+        return reverse("song_file", args=[self.song.slug, self.pk])
+
+    def get_preview_url(self):
+        return reverse("song_file_preview", args=[self.song.slug, self.pk])
+
+    def serve(self, request, disposition="attachment"):
+        return get_song_storage().serve(request, self.path, disposition, self.name)
+
+    @classmethod
+    def from_path(cls, song, path):
+        pure_path = pathlib.PurePosixPath(path)
+        suffix = pure_path.suffix.lower()
+        return cls(
+            song=song,
+            path=path,
+            name=pure_path.name,
+            suffix=suffix,
+            display_name=pure_path.stem.replace("_", " "),
+            sort_key=sort_key(suffix, pure_path.name),
+        )
+
+
+def sort_key(suffix, name):
+    """PDFs first, then by file type and name."""
+    return f"{'.000' if suffix == '.pdf' else suffix} {name}"
+
+
+class MailingListConsent(models.Model):
+    """
+    A member who agreed to join the mailing list when signing up. The
+    ``syncmailinglist`` command adds them to the Mailchimp list.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="mailing_list_consent",
+    )
+    consented_at = models.DateTimeField(default=timezone.now)
+    synced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return str(self.user)
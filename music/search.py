@@ -0,0 +1,94 @@
+"""
+Song name search.
+
+SQLite uses an FTS5 table kept in step with ``music_song`` by triggers, and
+PostgreSQL a trigram index on the name. Other backends fall back to
+``icontains``. Every word in the query is matched as a prefix, so results
+update as the user types.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS music_song_fts USING fts5(
+        name, content='music_song', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS music_song_fts_insert
+    AFTER INSERT ON music_song BEGIN
+        INSERT INTO music_song_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS music_song_fts_delete
+    AFTER DELETE ON music_song BEGIN
+        INSERT INTO music_song_fts(music_song_fts, rowid, name)
+        VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS music_song_fts_update
+    AFTER UPDATE OF name ON music_song BEGIN
+        INSERT INTO music_song_fts(music_song_fts, rowid, name)
+        VALUES ('delete', old.id, old.name);
+        INSERT INTO music_song_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    "INSERT INTO music_song_fts(music_song_fts) VALUES ('rebuild')",
+]
+
+POSTGRESQL_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS music_song_name_trgm "
+    "ON music_song USING gin (name gin_trgm_ops)",
+]
+
+DROP_INDEX = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS music_song_fts_insert",
+        "DROP TRIGGER IF EXISTS music_song_fts_delete",
+        "DROP TRIGGER IF EXISTS music_song_fts_update",
+        "DROP TABLE IF EXISTS music_song_fts",
+    ],
+    "postgresql": ["DROP INDEX IF EXISTS music_song_name_trgm"],
+}
+
+
+def create_search_index(connection):
+    statements = {"sqlite": SQLITE_INDEX, "postgresql": POSTGRESQL_INDEX}
+    with connection.cursor() as cursor:
+        for statement in statements.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        for statement in DROP_INDEX.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def search_songs(queryset, query):
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(
+                "SELECT rowid FROM music_song_fts WHERE music_song_fts MATCH %s",
+                (match,),
+            )
+        )
+    for term in terms:
+        if vendor == "postgresql":
+            queryset = queryset.filter(name__iregex=rf"\m{re.escape(term)}")
+        else:
+            queryset = queryset.filter(name__icontains=term)
+    return queryset
@@ -0,0 +1,252 @@
+"""
+Storage backends for song files.
+
+The backend is chosen with the ``SONG_STORAGE`` setting:
+
+``GCSSongStorage``
+    The Cloud Storage bucket the admin uploads into. Downloads redirect to a
+    signed URL, which stays the same for a few hours so browsers can reuse
+    the file they already fetched.
+``LocalSongStorage``
+    A mirror of the bucket on local disk, filled by ``manage.py
+    mirrorsongfiles``. Files are served by the app with HTTP Range support,
+    and gunicorn sends them with ``os.sendfile``.
+``MemorySongStorage``
+    Files held in a dict, for tests and benchmarks.
+"""
+
+import functools
+import io
+import logging
+import math
+import os
+import re
+from datetime import datetime, timedelta
+from datetime import timezone as datetime_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Return the ``(start, end)`` byte positions (inclusive) requested by a
+    Range header, or None to send the whole file. Only single ranges are
+    supported; anything else is ignored, as RFC 9110 allows.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            raise RangeNotSatisfiable
+    else:
+        # A suffix range: the last n bytes.
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        start, end = max(size - length, 0), size - 1
+    return start, end
+
+
+class RangeReader:
+    """
+    Read at most ``length`` bytes from a file positioned at the start of a
+    range. ``fileno()`` is passed through so gunicorn can still use
+    ``os.sendfile``, which sends Content-Length bytes from the current offset.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_response(request, file, size, filename, disposition):
+    as_attachment = disposition == "attachment"
+    try:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    except RangeNotSatisfiable:
+        file.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=as_attachment, filename=filename)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(
+            RangeReader(file, end - start + 1),
+            as_attachment=as_attachment,
+            filename=filename,
+            status=206,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, max-age=3600"
+    return response
+
+
+class SongStorage:
+    def serve(self, request, path, disposition, filename):
+        """Return a response that delivers the file to the browser."""
+        raise NotImplementedError
+
+    def size(self, path):
+        """Return the size of the file in bytes, or None if it is missing."""
+        raise NotImplementedError
+
+
+@functools.cache
+def gcs_client():
+    from google.cloud import storage
+
+    return storage.Client(credentials=settings.GS_CREDENTIALS)
+
+
+class LazyBucket(SimpleLazyObject):
+    """
+    A Cloud Storage bucket that creates the client when it's first used.
+    The name is available straight away, for registering the bucket with
+    direct_cloud_upload at import time.
+    """
+
+    def __init__(self, name):
+        super().__init__(lambda: gcs_client().bucket(name))
+        self.__dict__["name"] = name
+
+
+class GCSSongStorage(SongStorage):
+    # Signed URLs expire on a window boundary at least min_validity away, so
+    # every request inside a window gets the same URL.
+    window = timedelta(hours=6)
+    min_validity = timedelta(hours=24)
+
+    def __init__(self, bucket_name=None):
+        self.bucket_name = bucket_name or settings.BUCKET_NAME
+
+    @cached_property
+    def bucket(self):
+        return gcs_client().bucket(self.bucket_name)
+
+    def expires_at(self, now=None):
+        earliest = (now or timezone.now()) + self.min_validity
+        window = self.window.total_seconds()
+        return datetime.fromtimestamp(
+            math.ceil(earliest.timestamp() / window) * window, datetime_timezone.utc
+        )
+
+    def signed_url(self, path, disposition="attachment", expires=None):
+        blob = self.bucket.blob(path)
+        # V4 signatures include the signing time, so only V2 URLs repeat.
+        return blob.generate_signed_url(
+            version="v2",
+            response_disposition=disposition,
+            expiration=expires or self.expires_at(),
+        )
+
+    def serve(self, request, path, disposition, filename):
+        now = timezone.now()
+        expires = self.expires_at(now)
+        response = HttpResponseRedirect(self.signed_url(path, disposition, expires))
+        # The browser can follow the same redirect until the window moves on.
+        max_age = expires - self.min_validity - now
+        response["Cache-Control"] = f"private, max-age={int(max_age.total_seconds())}"
+        return response
+
+    def size(self, path):
+        from google.api_core.exceptions import GoogleAPIError
+
+        try:
+            blob = self.bucket.get_blob(path)
+        except GoogleAPIError:
+            logger.exception("Couldn't look up size of %s", path)
+            return None
+        return blob.size if blob is not None else None
+
+
+class LocalSongStorage(SongStorage):
+    def __init__(self, root=None):
+        self.root = Path(root or settings.SONG_FILES_ROOT).resolve()
+
+    def local_path(self, path):
+        local_path = (self.root / path).resolve()
+        if not local_path.is_relative_to(self.root):
+            raise SuspiciousFileOperation(f"{path} is outside the song files root")
+        return local_path
+
+    def serve(self, request, path, disposition, filename):
+        try:
+            file = self.local_path(path).open("rb")
+        except FileNotFoundError:
+            raise Http404(f"{path} is not in the local mirror")
+        size = os.fstat(file.fileno()).st_size
+        return file_response(request, file, size, filename, disposition)
+
+    def size(self, path):
+        try:
+            return self.local_path(path).stat().st_size
+        except FileNotFoundError:
+            return None
+
+
+class MemorySongStorage(SongStorage):
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+
+    def serve(self, request, path, disposition, filename):
+        if path not in self.files:
+            raise Http404(f"{path} is not in storage")
+        content = self.files[path]
+        return file_response(
+            request, io.BytesIO(content), len(content), filename, disposition
+        )
+
+    def size(self, path):
+        content = self.files.get(path)
+        return len(content) if content is not None else None
+
+
+@functools.cache
+def get_song_storage():
+    config = settings.SONG_STORAGE
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_song_storage(setting, **kwargs):
+    if setting == "SONG_STORAGE":
+        get_song_storage.cache_clear()
@@ -0,0 +1,34 @@
+from django.core.mail import mail_admins
+
+from music.embeds import fetch_oembed
+from tasks.queue import task
+
+
+@task
+def notify_invite_accepted(email):
+    mail_admins("Invitation accepted", f"Invitation accepted by {email}")
+
+
+@task(max_attempts=3)
+def fetch_embed_metadata(song_id):
+    from music.models import Song
+
+    song = Song.objects.filter(pk=song_id).exclude(embed_provider="").first()
+    if song is None:
+        return
+    data = fetch_oembed(song.embed_provider, song.embed_id)
+    # Only if the embed hasn't been changed again in the meantime.
+    Song.objects.filter(
+        pk=song.pk, embed_provider=song.embed_provider, embed_id=song.embed_id
+    ).update(
+        embed_title=data.get("title", "")[:255],
+        embed_thumbnail_url=data.get("thumbnail_url", "")[:500],
+    )
+
+
+@task(max_attempts=3)
+def fill_file_sizes(song_id):
+    from music.models import Song
+
+    if song := Song.objects.filter(pk=song_id).first():
+        song.fill_file_sizes()
@@ -1,7 +1,10 @@
-import markdown as md
+from django.conf import settings
+from django.contrib.sites.shortcuts import get_current_site
 from django.template import Library
 from django.utils.safestring import mark_safe
 
+from music import flatpages
+
 register = Library()
 
 
@@ -12,4 +15,19 @@ def readable_name(value):
 
 @register.filter
 def markdown(value):
-    return mark_safe(md.markdown(value))
+    return mark_safe(flatpages.markdown_to_html(value))
+
+
+@register.filter
+def flatpage_content(flatpage):
+    return mark_safe(flatpages.rendered_content(flatpage))
+
+
+@register.simple_tag(takes_context=True)
+def get_nav_flatpages(context):
+    if "request" in context:
+        site_id = get_current_site(context["request"]).pk
+    else:
+        site_id = settings.SITE_ID
+    user = context.get("user")
+    return flatpages.nav_flatpages(site_id, bool(user and user.is_authenticated))
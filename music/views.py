@@ -1,50 +1,117 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import render
+from django.contrib.flatpages.views import render_flatpage
+from django.contrib.sites.shortcuts import get_current_site
+from django.http import Http404, HttpResponsePermanentRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
-from django.views.generic.detail import DetailView
+from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.generic.list import ListView
 
 from events.models import Event, Occurrence
-from music.models import Song
+from lhc_sharing.caching import cache_policy
+from music.flatpages import site_flatpages
+from music.models import Song, SongFile
 
 
-def home(request):
-    occurrences = (
-        Occurrence.objects.filter(start_time__gte=timezone.now())
-        .select_related("event")
-        .order_by("start_time")
-    )
-    next_rehearsal = occurrences.filter(event__event_type__label="Rehearsal").first()
-    upcoming_performances = occurrences.filter(event__event_type__label="Performance")
-    
-    rehearsals = Event.objects.filter(
-        event_type__label='Rehearsal',
-        occurrence__start_time__gte=timezone.now(),
-    ).distinct()
-
-    return render(
-        request,
-        "home.html",
-        {
-            "next_rehearsal": next_rehearsal,
-            "upcoming_performances": upcoming_performances,
-            "rehearsals": rehearsals,
-        },
-    )
+@cache_policy("public")
+async def home(request):
+    context = {}
+    user = await request.auser()
+    if user.is_authenticated:
+        occurrences = (
+            Occurrence.objects.filter(start_time__gte=timezone.now())
+            .select_related("event")
+            .order_by("start_time")
+        )
+        context["next_rehearsal"] = await occurrences.filter(
+            event__event_type__label="Rehearsal"
+        ).afirst()
+        context["upcoming_performances"] = [
+            o async for o in occurrences.filter(event__event_type__label="Performance")
+        ]
+        context["rehearsals"] = [
+            event async for event in Event.objects.filter(
+                event_type__label='Rehearsal',
+                occurrence__start_time__gte=timezone.now(),
+            ).distinct()
+        ]
+
+    return await sync_to_async(render)(request, "home.html", context)
 
 
 class CurrentMusicList(LoginRequiredMixin, ListView):
     extra_context = {"current": True}
-    queryset = Song.objects.filter(current=True).order_by("name")
+    queryset = Song.objects.filter(current=True).with_file_summary().order_by("name")
     template_name = "songs.html"
+    paginate_by = 50
 
 
 class MusicList(LoginRequiredMixin, ListView):
     extra_context = {"current": False}
-    queryset = Song.objects.all().order_by("name")
+    queryset = Song.objects.with_file_summary().order_by("name")
     template_name = "songs.html"
+    paginate_by = 50
+
+
+SEARCH_RESULTS_LIMIT = 20
+
+
+@login_required
+def song_search(request):
+    songs = Song.objects.search(request.GET.get("q", "")).order_by("name")
+    return JsonResponse({
+        "results": [
+            {"name": song.name, "url": song.get_absolute_url()}
+            for song in songs.only("name", "slug")[:SEARCH_RESULTS_LIMIT]
+        ]
+    })
+
+
+class MusicDetail(View):
+    @method_decorator(login_required)
+    async def get(self, request, slug):
+        song = await (
+            Song.objects.filter(slug=slug).prefetch_related("song_files").afirst()
+        )
+        if song is None:
+            raise Http404("No song found matching the query")
+        files = song.song_files.all()
+        context = {
+            "song": song,
+            "files": files,
+            "tracks": [file for file in files if file.suffix == ".mp3"],
+        }
+        return await sync_to_async(render)(request, "files.html", context)
+
+
+@login_required
+def song_file(request, slug, file_id, disposition="attachment"):
+    """
+    Deliver one of a song's files from the song storage backend. For Cloud
+    Storage this signs a single URL and redirects to it, so signing only
+    happens for the files members actually open.
+    """
+    song_file = get_object_or_404(
+        SongFile.objects.select_related("song"), pk=file_id, song__slug=slug
+    )
+    return song_file.serve(request, disposition)
 
 
-class MusicDetail(LoginRequiredMixin, DetailView):
-    template_name = "files.html"
-    model = Song
+@cache_policy("public")
+def flatpage(request, url):
+    """
+    Serve a flat page, as ``django.contrib.flatpages.views.flatpage`` does,
+    but looking the page up in the cached url mapping.
+    """
+    if not url.startswith("/"):
+        url = "/" + url
+    pages = site_flatpages(get_current_site(request).id)
+    if url in pages:
+        return render_flatpage(request, pages[url])
+    if not url.endswith("/") and settings.APPEND_SLASH and url + "/" in pages:
+        return HttpResponsePermanentRedirect(f"{request.path}/")
+    raise Http404("No FlatPage matches the given query.")
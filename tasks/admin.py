@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_after", "finished_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("created_at", "finished_at", "last_error")
+    actions = ["retry"]
+
+    @admin.action(description="Retry now")
+    def retry(self, request, queryset):
+        num = queryset.exclude(status=Task.Status.RUNNING).update(
+            status=Task.Status.PENDING,
+            attempts=0,
+            run_after=timezone.now(),
+            finished_at=None,
+        )
+        self.message_user(
+            request, f"{num} task{'' if num == 1 else 's'} queued to run again."
+        )
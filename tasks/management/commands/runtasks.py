@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from tasks.queue import claim, run_task_in_thread
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Maximum number of tasks to run at once (default 4)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when no tasks are due (default 2)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no tasks are due instead of polling",
+        )
+
+    def handle(self, *args, concurrency, poll_interval, once, **options):
+        running = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    for task in claim(concurrency - len(running)):
+                        running.add(executor.submit(run_task_in_thread, task))
+                    if running:
+                        done, running = wait(
+                            running, timeout=poll_interval, return_when=FIRST_COMPLETED
+                        )
+                        for future in done:
+                            self.report(future.result())
+                    elif once:
+                        break
+                    else:
+                        time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                self.stdout.write("Finishing running tasks...")
+                for future in wait(running).done:
+                    self.report(future.result())
+
+    def report(self, task):
+        self.stdout.write(f"{task.name} #{task.pk}: {task.status}")
@@ -0,0 +1,115 @@
+"""
+A small database-backed queue for work that shouldn't hold up a request,
+such as calls to Mailchimp or sending mail.
+
+A task is a module-level function decorated with ``@task``. Calling
+``func.enqueue(*args, **kwargs)`` stores a Task row, in the same transaction
+as the rest of the request, and ``manage.py runtasks`` runs it. Arguments
+must be JSON serialisable, so pass primary keys rather than model instances.
+Failed tasks are retried with exponential backoff until ``max_attempts`` is
+reached.
+"""
+
+import functools
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, models
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = timedelta(seconds=30)
+MAX_RETRY_DELAY = timedelta(hours=1)
+LEASE = timedelta(minutes=10)
+
+
+def task(func=None, *, max_attempts=5):
+    """Register a function as a task, adding an ``enqueue`` method to it."""
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+
+    @functools.wraps(func)
+    def enqueue(*args, **kwargs):
+        return Task.objects.create(
+            name=func.task_name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=max_attempts,
+        )
+
+    func.task_name = f"{func.__module__}.{func.__qualname__}"
+    func.enqueue = enqueue
+    return func
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim(limit):
+    """
+    Mark up to ``limit`` tasks that are due as running and return them. Each
+    task is claimed with a conditional UPDATE, so two workers never run the
+    same task.
+    """
+    now = timezone.now()
+    due = models.Q(status=Task.Status.PENDING, run_after__lte=now) | models.Q(
+        status=Task.Status.RUNNING, locked_until__lt=now
+    )
+    claimed = []
+    for pk, status, attempts in Task.objects.filter(due).values_list(
+        "pk", "status", "attempts"
+    )[:limit]:
+        updated = Task.objects.filter(
+            pk=pk, status=status, attempts=attempts
+        ).update(
+            status=Task.Status.RUNNING,
+            attempts=attempts + 1,
+            locked_until=now + LEASE,
+        )
+        if updated:
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed))
+
+
+def run_task(task):
+    """Run a claimed task and record the outcome."""
+    try:
+        import_string(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        logger.exception("Task %s failed (attempt %d)", task.name, task.attempts)
+        task.last_error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            task.status = Task.Status.FAILED
+            task.finished_at = timezone.now()
+        else:
+            task.status = Task.Status.PENDING
+            task.run_after = timezone.now() + retry_delay(task.attempts)
+    else:
+        task.status = Task.Status.DONE
+        task.finished_at = timezone.now()
+    task.locked_until = None
+    task.save(
+        update_fields=[
+            "status", "run_after", "locked_until", "last_error", "finished_at"
+        ]
+    )
+    return task
+
+
+def run_task_in_thread(task):
+    try:
+        return run_task(task)
+    finally:
+        close_old_connections()
+
+
+def run_pending(limit=100):
+    """Run the tasks that are due in this thread, for tests and cron jobs."""
+    return [run_task(task) for task in claim(limit)]
+
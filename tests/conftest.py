@@ -0,0 +1,42 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def static_storage(settings):
+    # The manifest storage needs collectstatic to have been run.
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def song_storage(settings):
+    settings.SONG_STORAGE = {"BACKEND": "music.storage.MemorySongStorage"}
+
+
+@pytest.fixture(autouse=True)
+def raise_on_repeated_queries(settings):
+    settings.REPEATED_QUERY_RAISE = True
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def member(db):
+    return User.objects.create_user(username="member", first_name="Ann")
+
+
+@pytest.fixture
+def client_logged_in(client, member):
+    client.force_login(member)
+    return client
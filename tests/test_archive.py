@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from events.archive import archive_occurrences
+from events.models import ArchivedOccurrence, Event, EventType, Occurrence
+from events.rota import get_cached_feed, set_cached_feed
+from lhc_sharing.caching import get_cache_purger
+
+
+@pytest.fixture
+def weekly(member):
+    event = Event.objects.create(
+        title="Rehearsal", event_type=EventType.objects.create(label="Rehearsal")
+    )
+    start = datetime(2024, 1, 1, 19, 0, tzinfo=timezone.get_current_timezone())
+    return Occurrence.objects.bulk_create([
+        Occurrence(
+            event=event,
+            start_time=start + timedelta(weeks=week),
+            location="Hall",
+            opener=member,
+        )
+        for week in range(6)
+    ])
+
+
+def test_archive_moves_old_occurrences(weekly):
+    cutoff = weekly[3].start_time
+    assert archive_occurrences(cutoff, batch_size=2) == 3
+
+    assert list(Occurrence.objects.values_list("id", flat=True)) == [
+        o.id for o in weekly[3:]
+    ]
+    archived = list(ArchivedOccurrence.objects.all())
+    assert [o.id for o in archived] == [o.id for o in weekly[:3]]
+    assert archived[0].start_time == weekly[0].start_time
+    assert archived[0].location == "Hall"
+    assert archived[0].opener == weekly[0].opener
+
+    assert archive_occurrences(cutoff) == 0
+
+
+def test_archive_refreshes_feeds_once_per_batch(
+    weekly, member, settings, django_capture_on_commit_callbacks
+):
+    settings.CACHE_PURGER = {"BACKEND": "unittest.mock.Mock"}
+    set_cached_feed(member.pk, b"BEGIN:VCALENDAR")
+    with (
+        mock.patch("events.archive.invalidate_rota_feeds") as invalidate,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        archive_occurrences(weekly[3].start_time, batch_size=2)
+    assert invalidate.call_args_list == [mock.call({member.pk, None})] * 2
+    assert get_cache_purger().purge.call_count == 2
+
+    archive_occurrences(weekly[5].start_time)
+    assert get_cached_feed(member.pk) is None
+
+
+def test_archive_command(weekly, capsys):
+    call_command("archiveoccurrences", older_than=0, dry_run=True)
+    assert "6 occurrences" in capsys.readouterr().out
+    assert not ArchivedOccurrence.objects.exists()
+
+    call_command("archiveoccurrences", older_than=0)
+    assert "Archived 6 occurrences" in capsys.readouterr().out
+    assert not Occurrence.objects.exists()
+
+
+def test_month_view_reads_archive_for_past_months(client_logged_in, weekly):
+    archive_occurrences(weekly[3].start_time)
+    response = client_logged_in.get(reverse("event-monthly-view", args=[2024, 1]))
+    assert [o.id for o in response.context["occurrences"]] == [
+        o.id for o in weekly[:5]
+    ]
+    assert [e.title for e in response.context["rehearsals"]] == ["Rehearsal"]
+
+
+def test_month_view_skips_archive_for_future_months(client_logged_in, db):
+    now = timezone.localtime()
+    with CaptureQueriesContext(connection) as queries:
+        client_logged_in.get(
+            reverse("event-monthly-view", args=[now.year + 1, now.month])
+        )
+    assert not any(
+        "events_archivedoccurrence" in query["sql"] for query in queries
+    )
+
+
+def test_agenda_past_continues_into_archive(client_logged_in, weekly, monkeypatch):
+    archive_occurrences(weekly[3].start_time)
+    monkeypatch.setattr("events.views.AGENDA_PAGE_SIZE", 4)
+    url = reverse("event-agenda") + "?past=1"
+    ids = []
+    while url:
+        response = client_logged_in.get(url)
+        ids += [o.id for _, items in response.context["days"] for o in items]
+        url = response.context["next_url"]
+    assert ids == [o.id for o in reversed(weekly)]
+
+
+def test_archived_occurrence_page(client_logged_in, weekly):
+    archive_occurrences(weekly[1].start_time)
+    occurrence = weekly[0]
+    response = client_logged_in.get(
+        reverse("event-occurrence", args=[occurrence.event_id, occurrence.id])
+    )
+    assert response.status_code == 200
+    assert response.context["occurrence"].is_archived
+    assert b"Open: Ann" in response.content
@@ -0,0 +1,115 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.flatpages.models import FlatPage
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event, EventType, Occurrence
+from lhc_sharing.caching import CachePolicyMiddleware, cache_policy, get_cache_purger
+
+
+@pytest.fixture
+def purger(settings):
+    settings.CACHE_PURGER = {"BACKEND": "unittest.mock.Mock"}
+    return get_cache_purger()
+
+
+@pytest.fixture
+def pages(db):
+    public = FlatPage.objects.create(url="/about/", title="About", content="Hi")
+    members = FlatPage.objects.create(
+        url="/members/", title="Members", content="Secret", registration_required=True
+    )
+    public.sites.add(settings.SITE_ID)
+    members.sites.add(settings.SITE_ID)
+    return public, members
+
+
+def assert_shared(response, cache_control):
+    assert response["Cache-Control"] == f"public, max-age=300, {cache_control}"
+    assert "Cookie" in response["Vary"]
+
+
+def assert_private(response):
+    assert response["Cache-Control"] == "private, no-cache"
+    assert "Cookie" in response["Vary"]
+
+
+def test_anonymous_pages_are_shared(client, pages):
+    page = "s-maxage=300, stale-while-revalidate=3600"
+    assert_shared(client.get(reverse("home")), page)
+    assert_shared(client.get("/about/"), page)
+    assert_shared(client.get(reverse("event-feed")), "s-maxage=900")
+
+
+def test_member_pages_are_private(client, pages):
+    assert_private(client.get("/members/"))
+
+    client.force_login(User.objects.create_user(username="member"))
+    assert_private(client.get(reverse("home")))
+    assert_private(client.get("/about/"))
+    assert_private(client.get("/members/"))
+    assert_private(client.get(reverse("songs")))
+
+
+def test_response_setting_a_cookie_is_private():
+    @cache_policy("public")
+    def view(request):
+        response = HttpResponse()
+        response.set_cookie("messages", "x")
+        return response
+
+    request = RequestFactory().get("/")
+    assert_private(CachePolicyMiddleware(view)(request))
+
+
+def test_view_cache_control_is_kept():
+    def view(request):
+        response = HttpResponse()
+        response["Cache-Control"] = "private, max-age=3600"
+        return response
+
+    response = CachePolicyMiddleware(view)(RequestFactory().get("/"))
+    assert response["Cache-Control"] == "private, max-age=3600"
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        cache_policy("forever")
+
+
+def test_flatpage_change_purges_public_pages(
+    pages, purger, django_capture_on_commit_callbacks
+):
+    public, members = pages
+    with django_capture_on_commit_callbacks(execute=True):
+        public.url = "/about-us/"
+        public.save()
+    purger.purge.assert_called_once_with(["/", "/about-us/", "/members/"])
+
+
+def test_occurrence_change_purges_feed(
+    db, purger, django_capture_on_commit_callbacks
+):
+    event = Event.objects.create(
+        title="Rehearsal", event_type=EventType.objects.create(label="Rehearsal")
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        Occurrence.objects.create(
+            event=event,
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+        )
+    purger.purge.assert_called_once_with([reverse("event-feed")])
+
+
+def test_nothing_is_purged_until_commit(
+    pages, purger, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        pages[0].delete()
+    assert len(callbacks) == 1
+    purger.purge.assert_not_called()
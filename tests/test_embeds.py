@@ -0,0 +1,141 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from music.admin import SongForm
+from music.embeds import parse_embed
+from music.models import Song
+from tasks.models import Task
+from tasks.queue import run_pending
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (f"https://www.youtube.com/watch?v={VIDEO_ID}", ("youtube", VIDEO_ID)),
+        (f"https://www.youtube.com/watch?t=10&v={VIDEO_ID}", ("youtube", VIDEO_ID)),
+        (f"https://youtu.be/{VIDEO_ID}?si=abc", ("youtube", VIDEO_ID)),
+        (
+            f'<iframe width="560" src="https://www.youtube.com/embed/{VIDEO_ID}">'
+            "</iframe>",
+            ("youtube", VIDEO_ID),
+        ),
+        (
+            "https://musescore.com/user/123/scores/4567",
+            ("musescore", "user/123/scores/4567"),
+        ),
+        ("https://vimeo.com/12345", None),
+    ],
+)
+def test_parse_embed(text, expected):
+    assert parse_embed(text) == expected
+
+
+class StubOEmbed(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        self.server.requests.append(query["url"][0])
+        body = json.dumps({
+            "title": "Stub video",
+            "thumbnail_url": "https://thumbnails.example/stub.jpg",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def oembed(settings):
+    server = StubOEmbed()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    settings.OEMBED_API_URL = f"http://{host}:{port}/oembed"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def song(db):
+    return Song.objects.create(
+        name="Test Song",
+        slug="test-song",
+        embed=f"https://www.youtube.com/watch?v={VIDEO_ID}",
+    )
+
+
+def test_saving_embed_fetches_metadata_once(song, oembed):
+    assert (song.embed_provider, song.embed_id) == ("youtube", VIDEO_ID)
+    assert Task.objects.count() == 1
+
+    run_pending()
+    song.refresh_from_db()
+    assert oembed.requests == [f"https://www.youtube.com/watch?v={VIDEO_ID}"]
+    assert song.embed_title == "Stub video"
+    assert song.embed_thumbnail == "https://thumbnails.example/stub.jpg"
+
+    song.name = "Renamed"
+    song.save()
+    assert Task.objects.count() == 1
+
+    song.embed = "https://musescore.com/user/1/scores/2"
+    song.save()
+    assert song.embed_title == ""
+    assert Task.objects.count() == 2
+
+
+def test_clearing_embed(song):
+    song.embed = ""
+    song.save()
+    assert (song.embed_provider, song.embed_id) == ("", "")
+
+
+def test_song_page_shows_facade(client, song):
+    client.force_login(User.objects.create_user(username="member"))
+    response = client.get(reverse("song_detail", args=[song.slug]))
+    content = response.content.decode()
+    assert "<iframe" not in content
+    assert 'class="embed-facade' in content
+    assert f'data-embed-url="https://www.youtube-nocookie.com/embed/{VIDEO_ID}' in (
+        content
+    )
+    assert f"https://i.ytimg.com/vi/{VIDEO_ID}/hqdefault.jpg" in content
+
+
+def test_other_embed_codes_are_shown_as_they_are(client_logged_in, db):
+    embed = '<iframe src="https://player.vimeo.com/video/12345"></iframe>'
+    form = SongForm(data={
+        "name": "Song",
+        "slug": "song",
+        "created_at": "2025-01-01 00:00",
+        "current": True,
+        "embed": f"  {embed}\n",
+    })
+    assert form.is_valid(), form.errors
+    song = form.save()
+    assert (song.embed, song.embed_provider) == (embed, "")
+    assert not Task.objects.exists()
+
+    response = client_logged_in.get(reverse("song_detail", args=[song.slug]))
+    content = response.content.decode()
+    assert embed in content
+    assert 'class="embed-facade' not in content
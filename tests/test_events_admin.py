@@ -4,10 +4,14 @@ from unittest import mock
 import pytest
 from django.contrib.admin.sites import AdminSite
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from events.admin import EventAdmin, RecurringEventForm
+from events.archive import archive_occurrences
 from events.models import Event, EventType, Occurrence
+from events.scheduling import find_overlaps
 
 
 @pytest.fixture(autouse=True)
@@ -275,3 +279,291 @@ class TestEventAdmin:
 
             # Verify add_occurrences was not called
             mock_add.assert_not_called()
+
+
+class TestRotaExport:
+    url = "/admin/events/occurrence/export/"
+
+    @pytest.fixture
+    def occurrences(self, event, user):
+        opener = User.objects.create_user(
+            username="opener", first_name="Olive", last_name="Opener"
+        )
+        make = Occurrence.objects.create
+        utc = datetime.timezone.utc
+        return [
+            make(
+                event=event,
+                start_time=datetime.datetime(2025, 9, 1, 19, tzinfo=utc),
+                end_time=datetime.datetime(2025, 9, 1, 21, tzinfo=utc),
+                location="Conway Hall",
+                opener=opener,
+                closer=user,
+            ),
+            make(
+                event=event,
+                start_time=datetime.datetime(2025, 9, 8, 19, tzinfo=utc),
+                is_break=True,
+            ),
+            make(
+                event=event,
+                start_time=datetime.datetime(2025, 9, 15, 19, tzinfo=utc),
+            ),
+        ]
+
+    def test_shows_form_without_dates(self, client, user):
+        client.force_login(user)
+        response = client.get(self.url)
+        assert response.status_code == 200
+        assert b'name="start"' in response.content
+
+    def test_linked_from_changelist(self, client, user):
+        client.force_login(user)
+        response = client.get("/admin/events/occurrence/")
+        assert f'href="{self.url}"'.encode() in response.content
+
+    def test_rejects_reversed_range(self, client, user):
+        client.force_login(user)
+        response = client.get(self.url, {"start": "2025-09-10", "end": "2025-09-01"})
+        assert b"The end date is before the start date." in response.content
+
+    def test_streams_csv_for_range(self, client, user, occurrences):
+        client.force_login(user)
+        response = client.get(self.url, {"start": "2025-09-01", "end": "2025-09-08"})
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "text/csv"
+        assert b"".join(response.streaming_content).decode().splitlines() == [
+            "Event,Date,Start,End,Location,Break,Opener,Closer",
+            "Test Event,2025-09-01,19:00,21:00,Conway Hall,,Olive Opener,admin",
+            "Test Event,2025-09-08,19:00,,,yes,,",
+        ]
+
+    def test_includes_archived_occurrences(self, client, user, occurrences):
+        archive_occurrences(occurrences[1].start_time)
+        client.force_login(user)
+        response = client.get(self.url, {"start": "2025-09-01", "end": "2025-09-30"})
+        assert b"".join(response.streaming_content).decode().splitlines() == [
+            "Event,Date,Start,End,Location,Break,Opener,Closer",
+            "Test Event,2025-09-01,19:00,21:00,Conway Hall,,Olive Opener,admin",
+            "Test Event,2025-09-08,19:00,,,yes,,",
+            "Test Event,2025-09-15,19:00,,,,,",
+        ]
+
+    def test_requires_staff(self, client, db):
+        client.force_login(User.objects.create_user(username="member"))
+        response = client.get(self.url, {"start": "2025-09-01", "end": "2025-09-08"})
+        assert response.status_code == 302
+
+
+class TestBulkActions:
+    url = "/admin/events/occurrence/"
+
+    @pytest.fixture
+    def occurrences(self, event):
+        start = datetime.datetime(2025, 9, 1, 19, tzinfo=datetime.timezone.utc)
+        return Occurrence.objects.bulk_create([
+            Occurrence(
+                event=event,
+                start_time=start + datetime.timedelta(weeks=week),
+                end_time=start + datetime.timedelta(weeks=week, hours=2),
+                location="Conway Hall",
+            )
+            for week in range(3)
+        ])
+
+    @pytest.fixture
+    def admin_client(self, client, user):
+        client.force_login(user)
+        return client
+
+    def run_action(self, client, action, occurrences, **data):
+        selected = [o.pk for o in occurrences]
+        post = {"action": action, "_selected_action": selected}
+        preview = client.post(self.url, post)
+        assert preview.status_code == 200
+        assert preview.context["count"] == len(selected)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(self.url, {**post, **data, "apply": "1"})
+        assert response.status_code == 302
+        updates = [
+            q for q in queries if q["sql"].startswith('UPDATE "events_occurrence"')
+        ]
+        assert len(updates) == 1
+        return response
+
+    def test_preview_changes_nothing(self, admin_client, occurrences):
+        response = admin_client.post(
+            self.url,
+            {"action": "mark_break", "_selected_action": [occurrences[0].pk]},
+        )
+        assert b"This will change <strong>1 occurrence</strong>" in response.content
+        assert not Occurrence.objects.filter(is_break=True).exists()
+
+    def test_mark_break(self, admin_client, occurrences):
+        self.run_action(admin_client, "mark_break", occurrences[:2])
+        assert list(
+            Occurrence.objects.order_by("start_time").values_list(
+                "is_break", flat=True
+            )
+        ) == [True, True, False]
+
+    def test_set_location(self, admin_client, occurrences):
+        self.run_action(
+            admin_client, "set_location", occurrences, location="St Pancras"
+        )
+        assert set(Occurrence.objects.values_list("location", flat=True)) == {
+            "St Pancras"
+        }
+
+    def test_shift_times(self, admin_client, occurrences):
+        self.run_action(admin_client, "shift_times", occurrences, offset="-00:30:00")
+        for occurrence in occurrences:
+            before = occurrence.start_time, occurrence.end_time
+            occurrence.refresh_from_db()
+            assert occurrence.start_time == before[0] - datetime.timedelta(minutes=30)
+            assert occurrence.end_time == before[1] - datetime.timedelta(minutes=30)
+
+    def test_shift_times_needs_offset(self, admin_client, occurrences):
+        response = admin_client.post(self.url, {
+            "action": "shift_times",
+            "_selected_action": [occurrences[0].pk],
+            "offset": "0",
+            "apply": "1",
+        })
+        assert response.status_code == 200
+        assert b"Enter a non-zero offset." in response.content
+
+    def test_set_and_clear_opener(self, admin_client, user, occurrences):
+        feed = mock.Mock()
+        with mock.patch("events.admin.invalidate_rota_feeds", feed):
+            self.run_action(admin_client, "set_opener", occurrences, member=user.pk)
+        assert set(Occurrence.objects.values_list("opener", flat=True)) == {user.pk}
+        feed.assert_called_once_with({user.pk})
+
+        self.run_action(admin_client, "set_opener", occurrences[:1], member="")
+        occurrences[0].refresh_from_db()
+        assert occurrences[0].opener is None
+
+    def test_select_across(self, admin_client, occurrences):
+        response = admin_client.post(self.url, {
+            "action": "set_location",
+            "select_across": "1",
+            "_selected_action": [occurrences[0].pk],
+            "location": "Hall",
+            "apply": "1",
+        })
+        assert response.status_code == 302
+        assert Occurrence.objects.filter(location="Hall").count() == 3
+
+
+class TestRecurrenceOverlaps:
+    @pytest.fixture
+    def existing(self, event):
+        start = datetime.datetime(2025, 9, 3, 11, tzinfo=datetime.timezone.utc)
+        return Occurrence.objects.bulk_create([
+            Occurrence(
+                event=event,
+                start_time=start,
+                end_time=start + datetime.timedelta(hours=2),
+            ),
+            Occurrence(
+                event=event,
+                start_time=start + datetime.timedelta(days=2),
+                end_time=start + datetime.timedelta(days=2, hours=1),
+                is_break=True,
+            ),
+        ])
+
+    @pytest.fixture
+    def form_data(self, event_type):
+        return {
+            "title": "Rehearsal",
+            "event_type": event_type.id,
+            "start_time_0": "2025-09-01",
+            "start_time_1": "10:00:00",
+            "end_time": "12:00",
+            "days": [1, 3, 5],
+            "count": 6,
+        }
+
+    def test_find_overlaps_uses_one_query(self, event, existing):
+        start = datetime.datetime(2025, 9, 1, 10, tzinfo=datetime.timezone.utc)
+        candidates = event.expand_occurrences(
+            start, start + datetime.timedelta(hours=2), "", count=14
+        )
+        with CaptureQueriesContext(connection) as queries:
+            found = find_overlaps(candidates)
+        assert len(queries) == 1
+        # Back-to-back occurrences and breaks don't count.
+        assert [(c.start_time.day, e.pk) for c, e in found] == [(3, existing[0].pk)]
+
+    def test_form_rejects_overlaps(self, form_data, existing):
+        form = RecurringEventForm(data=form_data)
+        assert not form.is_valid()
+        assert form.errors["__all__"][0] == (
+            "Wed 03 Sep 2025 10:00 overlaps Test Event on 2025-09-03 11:00"
+        )
+
+        form = RecurringEventForm(data={**form_data, "allow_overlaps": "on"})
+        assert form.is_valid(), form.errors
+
+    def test_admin_saves_overlaps_when_allowed(
+        self, client, user, form_data, existing
+    ):
+        client.force_login(user)
+        url = "/admin/events/event/add/"
+        assert b'name="allow_overlaps"' in client.get(url).content
+
+        inline = {
+            "occurrence_set-TOTAL_FORMS": "0",
+            "occurrence_set-INITIAL_FORMS": "0",
+        }
+        response = client.post(url, {**form_data, **inline})
+        assert response.status_code == 200
+        assert b"Allow overlaps" in response.content
+        assert Event.objects.count() == 1
+
+        response = client.post(url, {**form_data, **inline, "allow_overlaps": "on"})
+        assert response.status_code == 302
+        event = Event.objects.get(title="Rehearsal")
+        assert event.occurrence_set.count() == 6
+
+    def test_form_limits_occurrences(self, form_data):
+        form = RecurringEventForm(data={**form_data, "count": 400})
+        assert not form.is_valid()
+        assert "more than 366 occurrences" in form.errors["__all__"][0]
+
+    def test_form_stops_expanding_past_the_limit(self, form_data):
+        form = RecurringEventForm(
+            data={**form_data, "count": "", "until": "9999-12-30"}
+        )
+        assert not form.is_valid()
+        assert "more than 366 occurrences" in form.errors["__all__"][0]
+        assert len(form.candidates) == 367
+
+    def test_preview_writes_nothing(self, client, user, form_data, existing):
+        client.force_login(user)
+        response = client.post(
+            "/admin/events/event/preview/", form_data, headers={"X-Partial": "preview"}
+        )
+        assert response.status_code == 200
+        assert response.templates[0].name == (
+            "admin/events/event/recurrence_preview.html"
+        )
+        occurrences = response.context["occurrences"]
+        assert len(occurrences) == 6
+        assert [len(overlapping) for _, overlapping in occurrences] == [
+            0, 1, 0, 0, 0, 0
+        ]
+        assert response.context["overlap_count"] == 1
+        assert Event.objects.count() == 1
+        assert Occurrence.objects.count() == 2
+
+        response = client.post("/admin/events/event/preview/", form_data)
+        assert b"Preview recurring event" in response.content
+
+    def test_preview_needs_permission(self, client, form_data):
+        client.force_login(User.objects.create_user("member", is_staff=True))
+        response = client.post("/admin/events/event/preview/", form_data)
+        assert response.status_code == 403
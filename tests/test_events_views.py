@@ -1,13 +1,14 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from datetime import timezone as datetime_timezone
 from unittest import mock
 
 import pytest
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 
-from events.models import Event, EventType, Occurrence
+from events.models import Event, EventType, Occurrence, RotaFeedToken
 
 
 @pytest.fixture
@@ -129,6 +130,25 @@ def test_month_view_notes_navigation_dates(client_logged_in, occurrences_august_
     assert context["last_month"].year == 2025
 
 
+def test_month_view_notes_buckets_by_local_day(client_logged_in, event):
+    # Just after midnight in London during BST is still the previous day in
+    # UTC, and the month boundary falls between them.
+    london = timezone.get_current_timezone()
+    late = Occurrence.objects.create(
+        event=event, start_time=datetime(2025, 3, 31, 0, 30, tzinfo=london)
+    )
+    Occurrence.objects.create(
+        event=event, start_time=datetime(2025, 4, 1, 0, 30, tzinfo=london)
+    )
+
+    response = client_logged_in.get(reverse("event-monthly-view", args=[2025, 3]))
+
+    days = dict(day for week in response.context["calendar"] for day in week)
+    assert days[31] == [late]
+    assert days[30] == []
+    assert response.context["occurrences"] == [late]
+
+
 def test_occurrence_grid_signup_get_shows_future_occurrences(
     client_logged_in, event, future_occurrences
 ):
@@ -273,3 +293,269 @@ def test_occurrence_grid_signup_template_shows_cancel_button(
         )
         response = client_logged_in.get(url)
     assert b"Cancel sign-up" in response.content
+
+
+def test_event_occurrence_shows_details(client_logged_in, occurrences_august_2025):
+    occ = occurrences_august_2025[0]
+    response = client_logged_in.get(occ.get_absolute_url())
+    assert response.status_code == 200
+    assert response.context["occurrence"] == occ
+
+
+def test_event_occurrence_wrong_event_404(client_logged_in, occurrences_august_2025):
+    occ = occurrences_august_2025[0]
+    url = reverse("event-occurrence", args=[occ.event_id + 1, occ.id])
+    response = client_logged_in.get(url)
+    assert response.status_code == 404
+
+
+def test_event_feed_lists_occurrences(client, occurrences_august_2025):
+    response = client.get(reverse("event-feed"))
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/calendar")
+    assert response.content.count(b"BEGIN:VEVENT") == 3
+    assert b"SUMMARY:Summer Rehearsals" in response.content
+
+
+@pytest.mark.django_db(transaction=True)
+def test_month_view_notes_under_asgi(async_client, user, occurrences_august_2025):
+    async_to_sync(async_client.aforce_login)(user)
+    url = reverse("event-monthly-view", args=[2025, 8])
+    response = async_to_sync(async_client.get)(url)
+    assert response.status_code == 200
+    assert len(response.context["occurrences"]) == 3
+
+
+def test_occurrence_grid_signup_post_returns_row(
+    client_logged_in, event, future_occurrences, user, django_assert_num_queries
+):
+    occ = future_occurrences[0]
+    url = reverse("occurrence_signup_grid", args=[event.id])
+
+    # Session and user, the UPDATE, the row with its sign-ups, then the
+    # user and group permissions for the Edit link.
+    with django_assert_num_queries(6):
+        response = client_logged_in.post(
+            url, {"occurrence_id": occ.id, "role": "opener"}, HTTP_X_PARTIAL="row"
+        )
+
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert content.startswith(f'<tr id="occurrence-{occ.id}">')
+    assert "testuser" in content
+    assert "Cancel sign-up" in content
+    assert "<table" not in content
+
+
+def test_occurrence_grid_signup_post_returns_json(
+    client_logged_in, event, future_occurrences, user, other_user
+):
+    occ = future_occurrences[0]
+    occ.closer = other_user
+    occ.save()
+    url = reverse("occurrence_signup_grid", args=[event.id])
+
+    response = client_logged_in.post(
+        url,
+        {"occurrence_id": occ.id, "role": "opener"},
+        HTTP_ACCEPT="application/json",
+    )
+
+    assert response.json() == {
+        "id": occ.id,
+        "opener": {"name": "testuser", "is_me": True},
+        "closer": {"name": "otheruser", "is_me": False},
+    }
+
+    response = client_logged_in.post(
+        url,
+        {"occurrence_id": occ.id, "role": "opener"},
+        HTTP_ACCEPT="application/json",
+    )
+    assert response.json()["opener"] is None
+
+
+def test_occurrence_grid_signup_partial_other_event_404(
+    client_logged_in, event, event_type, future_occurrences, user
+):
+    other_event = Event.objects.create(title="Other", event_type=event_type)
+    occ = future_occurrences[0]
+    url = reverse("occurrence_signup_grid", args=[other_event.id])
+
+    response = client_logged_in.post(
+        url, {"occurrence_id": occ.id, "role": "opener"}, HTTP_X_PARTIAL="row"
+    )
+
+    assert response.status_code == 404
+    occ.refresh_from_db()
+    assert occ.opener is None
+
+
+@pytest.fixture
+def rota_url(user):
+    feed_token = RotaFeedToken.objects.create(user=user)
+    return reverse("rota-feed", args=[feed_token.token])
+
+
+def test_rota_feed_only_has_members_signups(
+    client, rota_url, future_occurrences, user, other_user
+):
+    mine, theirs, _ = future_occurrences
+    mine.opener = mine.closer = user
+    mine.save()
+    theirs.opener = other_user
+    theirs.save()
+
+    response = client.get(rota_url)
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/calendar")
+    content = response.content.decode()
+    assert content.count("BEGIN:VEVENT") == 1
+    assert "SUMMARY:Open & Close: Summer Rehearsals" in content.replace("\\&", "&")
+
+
+def test_rota_feed_is_cached_until_signups_change(
+    client, rota_url, future_occurrences, user, django_assert_num_queries
+):
+    occ = future_occurrences[0]
+    occ.opener = user
+    occ.save()
+    first = client.get(rota_url)
+
+    with django_assert_num_queries(1):  # just the token
+        again = client.get(rota_url)
+    assert again.content == first.content
+
+    with django_assert_num_queries(1):
+        not_modified = client.get(rota_url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert not_modified.status_code == 304
+
+    occ.closer = user
+    occ.save()
+    changed = client.get(rota_url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert changed.status_code == 200
+    assert changed["ETag"] != first["ETag"]
+
+
+def test_rota_feed_cache_expires(
+    client, rota_url, future_occurrences, user, settings
+):
+    settings.CACHES = {
+        "default": {**settings.CACHES["default"], "TIMEOUT": 0},
+    }
+    assert b"BEGIN:VEVENT" not in client.get(rota_url).content
+    # A change whose invalidation only reached another process's cache.
+    Occurrence.objects.filter(pk=future_occurrences[0].pk).update(opener=user)
+    assert b"BEGIN:VEVENT" in client.get(rota_url).content
+
+
+def test_rota_feed_refreshed_by_grid_toggle_and_cancel(
+    client, client_logged_in, rota_url, event, future_occurrences, user
+):
+    occ = future_occurrences[0]
+    assert b"BEGIN:VEVENT" not in client.get(rota_url).content
+
+    url = reverse("occurrence_signup_grid", args=[event.id])
+    client_logged_in.post(url, {"occurrence_id": occ.id, "role": "closer"})
+    assert b"BEGIN:VEVENT" in client.get(rota_url).content
+
+    # Removing the sign-up in the admin refreshes the old member's feed.
+    occ = Occurrence.objects.get(pk=occ.pk)
+    occ.closer = None
+    occ.save()
+    assert b"BEGIN:VEVENT" not in client.get(rota_url).content
+
+
+def test_rota_feed_unknown_token(client, db):
+    assert client.get(reverse("rota-feed", args=["nope"])).status_code == 404
+
+
+def test_my_rota_reset_revokes_old_url(client_logged_in, rota_url, user):
+    response = client_logged_in.get(reverse("my-rota"))
+    assert rota_url in response.context["feed_url"]
+
+    client_logged_in.post(reverse("my-rota"))
+    assert client_logged_in.get(rota_url).status_code == 404
+    new_url = reverse("rota-feed", args=[RotaFeedToken.objects.get(user=user).token])
+    assert client_logged_in.get(new_url).status_code == 200
+
+
+@pytest.fixture
+def weekly_occurrences(event):
+    london = timezone.get_current_timezone()
+    start = datetime(2025, 9, 1, 19, 0, tzinfo=london)
+    return Occurrence.objects.bulk_create([
+        Occurrence(event=event, start_time=start + timedelta(weeks=week))
+        for week in range(5)
+    ] + [
+        # Two at the same time, to exercise the id tie-break.
+        Occurrence(event=event, start_time=start + timedelta(weeks=2)),
+    ])
+
+
+def agenda_pages(client, url, page_size, monkeypatch, **headers):
+    monkeypatch.setattr("events.views.AGENDA_PAGE_SIZE", page_size)
+    pages = []
+    while url:
+        response = client.get(url, **headers)
+        assert response.status_code == 200
+        pages.append(
+            [o.id for _, items in response.context["days"] for o in items]
+        )
+        url = response.context["next_url"]
+    return pages
+
+
+def test_agenda_pages_by_keyset(
+    client_logged_in, weekly_occurrences, monkeypatch
+):
+    expected = [
+        o.id
+        for o in sorted(weekly_occurrences, key=lambda o: (o.start_time, o.id))
+    ]
+    with mock.patch("events.views.timezone.now") as mock_now:
+        mock_now.return_value = datetime(2025, 8, 1, tzinfo=datetime_timezone.utc)
+        pages = agenda_pages(
+            client_logged_in, reverse("event-agenda"), 2, monkeypatch
+        )
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert sum(pages, []) == expected
+
+
+def test_agenda_past_pages_backwards(
+    client_logged_in, weekly_occurrences, monkeypatch
+):
+    expected = [
+        o.id
+        for o in sorted(
+            weekly_occurrences, key=lambda o: (o.start_time, o.id), reverse=True
+        )
+    ]
+    with mock.patch("events.views.timezone.now") as mock_now:
+        mock_now.return_value = datetime(2026, 1, 1, tzinfo=datetime_timezone.utc)
+        pages = agenda_pages(
+            client_logged_in, reverse("event-agenda") + "?past=1", 4, monkeypatch
+        )
+    assert sum(pages, []) == expected
+
+
+def test_agenda_partial_page_continues_day(
+    client_logged_in, weekly_occurrences, monkeypatch
+):
+    monkeypatch.setattr("events.views.AGENDA_PAGE_SIZE", 3)
+    with mock.patch("events.views.timezone.now") as mock_now:
+        mock_now.return_value = datetime(2025, 8, 1, tzinfo=datetime_timezone.utc)
+        first = client_logged_in.get(reverse("event-agenda"))
+    # The third page item is one of the two on 15 September.
+    response = client_logged_in.get(first.context["next_url"], HTTP_X_PARTIAL="page")
+    content = response.content.decode()
+    assert "<html" not in content
+    assert "Monday, September 15" not in content
+    assert "Monday, September 22" in content
+    assert 'class="agenda-more' in content
+
+
+def test_agenda_rejects_bad_cursor(client_logged_in, db):
+    response = client_logged_in.get(reverse("event-agenda"), {"cursor": "nope"})
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.flatpages.models import FlatPage
+
+from music.flatpages import nav_flatpages, rendered_content, site_flatpages
+
+
+@pytest.fixture
+def public_page(db):
+    page = FlatPage.objects.create(
+        url="/about/", title="About", content="Some **bold** text"
+    )
+    page.sites.add(settings.SITE_ID)
+    return page
+
+
+@pytest.fixture
+def members_page(db):
+    page = FlatPage.objects.create(
+        url="/members/", title="Members", content="Secret", registration_required=True
+    )
+    page.sites.add(settings.SITE_ID)
+    return page
+
+
+def test_nav_flatpages_filters_by_auth_state(public_page, members_page):
+    anonymous = nav_flatpages(settings.SITE_ID, authenticated=False)
+    authenticated = nav_flatpages(settings.SITE_ID, authenticated=True)
+    assert [page.url for page in anonymous] == ["/about/"]
+    assert [page.url for page in authenticated] == ["/about/", "/members/"]
+
+
+def test_nav_flatpages_cached(public_page, django_assert_num_queries):
+    nav_flatpages(settings.SITE_ID, authenticated=False)
+    with django_assert_num_queries(0):
+        pages = nav_flatpages(settings.SITE_ID, authenticated=False)
+    assert [page.title for page in pages] == ["About"]
+
+
+def test_nav_flatpages_cache_expires(public_page, settings, django_assert_num_queries):
+    # Other processes' caches don't see invalidations, so entries expire.
+    settings.CACHES = {
+        "default": {**settings.CACHES["default"], "TIMEOUT": 0},
+    }
+    nav_flatpages(settings.SITE_ID, authenticated=False)
+    with django_assert_num_queries(1):
+        nav_flatpages(settings.SITE_ID, authenticated=False)
+
+
+def test_flatpage_save_invalidates_cache(public_page):
+    assert "Some <strong>bold</strong> text" in rendered_content(public_page)
+    nav_flatpages(settings.SITE_ID, authenticated=False)
+
+    public_page.title = "About us"
+    public_page.content = "New text"
+    public_page.save()
+
+    pages = nav_flatpages(settings.SITE_ID, authenticated=False)
+    assert [page.title for page in pages] == ["About us"]
+    assert rendered_content(public_page) == "<p>New text</p>"
+
+
+def test_flatpage_site_change_invalidates_cache(public_page):
+    assert "/about/" in site_flatpages(settings.SITE_ID)
+    public_page.sites.clear()
+    assert site_flatpages(settings.SITE_ID) == {}
+
+
+def test_flatpage_view_renders_markdown(client, public_page):
+    response = client.get("/about/")
+    assert response.status_code == 200
+    assert b"Some <strong>bold</strong> text" in response.content
+
+
+def test_flatpage_view_appends_slash(client, public_page):
+    response = client.get("/about")
+    assert response.status_code == 301
+    assert response.url == "/about/"
+
+
+def test_flatpage_view_missing_page(client, public_page):
+    response = client.get("/nowhere/")
+    assert response.status_code == 404
+
+
+def test_flatpage_view_requires_login_for_members_page(client, members_page):
+    response = client.get("/members/")
+    assert response.status_code == 302
+    assert "/accounts/login/" in response.url
+
+    client.force_login(User.objects.create_user(username="member"))
+    response = client.get("/members/")
+    assert response.status_code == 200
+    assert b"Secret" in response.content
+
+
+def test_base_template_lists_nav_flatpages(client, public_page, members_page):
+    response = client.get("/about/")
+    assert b'href="/about/"' in response.content
+    assert b'href="/members/"' not in response.content
@@ -0,0 +1,62 @@
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.urls import reverse
+from invitations.models import Invitation
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        if any("bad@" in r for m in messages for r in m.recipients()):
+            raise OSError("rejected")
+        return super().send_messages(messages)
+
+
+def resend(admin_client, invitations):
+    return admin_client.post(
+        reverse("admin:invitations_invitation_changelist"),
+        {
+            "action": "resend_invitation",
+            "_selected_action": [invitation.pk for invitation in invitations],
+        },
+    )
+
+
+def test_resend_invitations_in_bulk(admin_client, settings):
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    invitations = [Invitation.create(f"friend{i}@example.com") for i in range(5)]
+
+    response = resend(admin_client, invitations)
+    assert response.status_code == 302
+    assert sorted(m.to[0] for m in mail.outbox) == [i.email for i in invitations]
+    body = next(m.body for m in mail.outbox if m.to == [invitations[0].email])
+    assert f"http://testserver/invitations/accept-invite/{invitations[0].key}" in body
+    assert Invitation.objects.filter(sent__isnull=True).count() == 0
+    messages = [str(m) for m in get_messages(response.wsgi_request)]
+    assert messages == ["5 invitations have been resent."]
+
+
+def test_resend_reports_failures_and_uses_one_connection(admin_client, monkeypatch):
+    connections = []
+
+    def get_connection():
+        connections.append(FailingBackend())
+        return connections[-1]
+
+    monkeypatch.setattr("music.invitations.get_connection", get_connection)
+    good = Invitation.create("good@example.com")
+    bad = Invitation.create("bad@example.com")
+
+    response = resend(admin_client, [good, bad])
+
+    assert len(connections) == 1
+    assert [m.to for m in mail.outbox] == [["good@example.com"]]
+    good.refresh_from_db()
+    bad.refresh_from_db()
+    assert good.sent is not None
+    assert bad.sent is None
+    messages = [str(m) for m in get_messages(response.wsgi_request)]
+    assert messages == [
+        "1 invitation has been resent.",
+        "Couldn't send to: bad@example.com (rejected)",
+    ]
@@ -0,0 +1,160 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+
+from music.forms import SignupForm
+from music.mailchimp import subscriber_hash
+from music.models import MailingListConsent
+
+LIST_ID = "test-list"
+
+
+class StubMailchimp(ThreadingHTTPServer):
+    """Just enough of the Mailchimp API for the list sync."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.members = []
+        self.requests = []
+        self.batches = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.server.requests.append(("GET", url.path))
+        query = parse_qs(url.query)
+        offset, count = int(query["offset"][0]), int(query["count"][0])
+        self.send_json({
+            "members": self.server.members[offset:offset + count],
+            "total_items": len(self.server.members),
+        })
+
+    def do_POST(self):
+        self.server.requests.append(("POST", self.path))
+        length = int(self.headers["Content-Length"])
+        self.server.batches.append(json.loads(self.rfile.read(length)))
+        self.send_json({"id": "batch-1", "status": "pending"})
+
+
+@pytest.fixture
+def mailchimp(settings):
+    server = StubMailchimp()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    settings.MAILCHIMP_API_URL = f"http://{host}:{port}/3.0"
+    settings.MAILCHIMP_LIST_ID = LIST_ID
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def member(email, first_name, last_name):
+    return {
+        "email_address": email,
+        "merge_fields": {"FNAME": first_name, "LNAME": last_name},
+    }
+
+
+def consent(email, first_name, last_name):
+    user = User.objects.create_user(
+        username=email, email=email, first_name=first_name, last_name=last_name
+    )
+    return MailingListConsent.objects.create(user=user)
+
+
+def test_signup_records_consent_without_calling_mailchimp(db, mailchimp):
+    user = User.objects.create_user(username="new", email="new@example.com")
+    SignupForm().signup(None, user)
+    assert MailingListConsent.objects.filter(user=user).exists()
+    assert mailchimp.requests == []
+
+
+def test_sync_sends_only_changes_in_one_batch(db, mailchimp):
+    consent("same@example.com", "Same", "Person")
+    consent("renamed@example.com", "New", "Name")
+    new = consent("New@Example.com", "New", "Member")
+    mailchimp.members = [
+        member("same@example.com", "Same", "Person"),
+        member("renamed@example.com", "Old", "Name"),
+    ]
+
+    call_command("syncmailinglist")
+
+    assert mailchimp.requests == [
+        ("GET", f"/3.0/lists/{LIST_ID}/members"),
+        ("POST", "/3.0/batches"),
+    ]
+    [batch] = mailchimp.batches
+    operations = {op["path"]: op for op in batch["operations"]}
+    assert len(operations) == 2
+
+    added = operations[f"/lists/{LIST_ID}/members/{subscriber_hash(new.user.email)}"]
+    assert added["method"] == "PUT"
+    assert json.loads(added["body"]) == {
+        "email_address": new.user.email,
+        "status_if_new": "subscribed",
+        "merge_fields": {"FNAME": "New", "LNAME": "Member"},
+    }
+    renamed = operations[
+        f"/lists/{LIST_ID}/members/{subscriber_hash('renamed@example.com')}"
+    ]
+    assert renamed["method"] == "PATCH"
+    assert json.loads(renamed["body"]) == {
+        "merge_fields": {"FNAME": "New", "LNAME": "Name"}
+    }
+
+    synced = MailingListConsent.objects.filter(synced_at__isnull=False)
+    assert sorted(c.user.email for c in synced) == [
+        "New@example.com", "renamed@example.com"
+    ]
+
+
+def test_sync_pages_through_list(db, mailchimp, monkeypatch):
+    monkeypatch.setattr("music.mailchimp.PAGE_SIZE", 2)
+    mailchimp.members = [
+        member(f"member{i}@example.com", "Member", str(i)) for i in range(5)
+    ]
+    consent("member4@example.com", "Member", "4")
+
+    call_command("syncmailinglist")
+
+    assert [r for r in mailchimp.requests if r[0] == "GET"] == [
+        ("GET", f"/3.0/lists/{LIST_ID}/members")
+    ] * 3
+    assert mailchimp.batches == []
+
+
+def test_sync_dry_run_sends_nothing(db, mailchimp):
+    consent("new@example.com", "New", "Member")
+    call_command("syncmailinglist", dry_run=True)
+    assert mailchimp.batches == []
+    assert not MailingListConsent.objects.filter(synced_at__isnull=False).exists()
+
+
+def test_sync_runs_from_cron(client, db, mailchimp, settings):
+    settings.CRON_SECRET = "secret"
+    consent("new@example.com", "New", "Member")
+    response = client.get(
+        reverse("cron", args=["syncmailinglist"]), HTTP_AUTHORIZATION="Bearer secret"
+    )
+    assert response.status_code == 200
+    assert len(mailchimp.batches) == 1
@@ -1,17 +1,23 @@
 import json
-import pathlib
+from datetime import datetime, timedelta
 from unittest import mock
 
 import pytest
+from django.urls import reverse
 
-from music.models import Song
+from music.models import Song, SongFile
+from music.storage import get_song_storage
+from music.tasks import fill_file_sizes
+from tasks.models import Task
+from tasks.queue import run_pending
 
 
 @pytest.fixture
-def gcs_bucket_mock(monkeypatch):
-    # Patch the gcs_bucket used in models to use a mock
+def gcs_bucket_mock(settings):
+    # Serve from Cloud Storage, with a mock in place of the bucket
+    settings.SONG_STORAGE = {"BACKEND": "music.storage.GCSSongStorage"}
     bucket_mock = mock.Mock()
-    monkeypatch.setattr("music.models.gcs_bucket", bucket_mock)
+    get_song_storage().bucket = bucket_mock
     return bucket_mock
 
 
@@ -27,75 +33,232 @@ def song_factory(db):
     return factory
 
 
-def test_file_urls_mixed_files_params(gcs_bucket_mock, song_factory):
-    files = ["score.pdf", "audio.mp3"]
-    song = song_factory(files)
+def test_signed_url_params(gcs_bucket_mock):
+    blob_mock = gcs_bucket_mock.blob.return_value
+    blob_mock.generate_signed_url.return_value = "signed-url-pdf"
 
-    # Each file gets its own blob mock
-    pdf_blob_mock = mock.Mock()
-    pdf_blob_mock.generate_signed_url.return_value = "signed-url-pdf"
-    mp3_blob_mock = mock.Mock()
-    mp3_blob_mock.generate_signed_url.return_value = "signed-url-mp3"
+    storage = get_song_storage()
+    assert storage.signed_url("score.pdf") == "signed-url-pdf"
+    assert storage.signed_url("score.pdf", "inline") == "signed-url-pdf"
 
-    def blob_side_effect(file):
-        if file == "score.pdf":
-            return pdf_blob_mock
-        elif file == "audio.mp3":
-            return mp3_blob_mock
-        else:
-            raise ValueError("Unexpected file")
+    gcs_bucket_mock.blob.assert_called_with("score.pdf")
+    blob_mock.generate_signed_url.assert_has_calls([
+        mock.call(
+            version="v2", response_disposition="attachment", expiration=mock.ANY
+        ),
+        mock.call(version="v2", response_disposition="inline", expiration=mock.ANY),
+    ])
 
-    gcs_bucket_mock.blob.side_effect = blob_side_effect
 
-    result = song.file_urls
+@pytest.mark.parametrize(
+    "now, expires",
+    [
+        ("2025-03-01T00:00:00", "2025-03-02T00:00:00"),
+        ("2025-03-01T00:00:01", "2025-03-02T06:00:00"),
+        ("2025-03-01T05:59:59", "2025-03-02T06:00:00"),
+        ("2025-03-01T06:00:00", "2025-03-02T06:00:00"),
+        ("2025-03-01T23:30:00", "2025-03-03T00:00:00"),
+    ],
+)
+def test_signed_url_expiry_windows(settings, now, expires):
+    settings.SONG_STORAGE = {"BACKEND": "music.storage.GCSSongStorage"}
+    now = datetime.fromisoformat(now + "+00:00")
+    expires_at = get_song_storage().expires_at(now)
+    assert expires_at == datetime.fromisoformat(expires + "+00:00")
+    assert expires_at - now >= timedelta(hours=24)
 
-    # PDF: two calls with correct params
-    expected_pdf_calls = [
-        mock.call(response_disposition="attachment", expiration=mock.ANY),
-        mock.call(response_disposition="inline", expiration=mock.ANY),
-    ]
-    pdf_blob_mock.generate_signed_url.assert_has_calls(
-        expected_pdf_calls,
-        any_order=False
+
+def test_song_files_sorted_pdf_first_and_by_name(song_factory):
+    song = song_factory(["b.mp3", "a.pdf", "c.pdf", "a.mp3"])
+    sorted_paths = [entry.name for entry in song.song_files.all()]
+
+    # Expected: PDFs first, sorted by name; then MP3s, sorted by name
+    expected_order = ["a.pdf", "c.pdf", "a.mp3", "b.mp3"]
+    assert sorted_paths == expected_order
+
+
+def test_music_detail_does_not_sign_urls(
+    client_logged_in, gcs_bucket_mock, song_factory
+):
+    song = song_factory(["score.pdf", "audio.mp3"])
+    pdf, mp3 = song.song_files.all()
+    response = client_logged_in.get(reverse("song_detail", args=["test-song"]))
+    assert response.status_code == 200
+    gcs_bucket_mock.blob.assert_not_called()
+    assert f'href="/song/test-song/file/{pdf.pk}"'.encode() in response.content
+    assert f'data-bs-url="/song/test-song/preview/{pdf.pk}"'.encode() in (
+        response.content
+    )
+    assert f'data-track-url="/song/test-song/preview/{mp3.pk}"'.encode() in (
+        response.content
     )
+    # One shared player, which doesn't load anything until a track is picked.
+    assert response.content.count(b"<audio") == 1
+    assert b'preload="none"' in response.content
+
+
+def test_music_detail_without_audio_has_no_player(client_logged_in, song_factory):
+    song_factory(["score.pdf"])
+    response = client_logged_in.get(reverse("song_detail", args=["test-song"]))
+    assert b"<audio" not in response.content
+
+
+def test_song_file_redirects_to_signed_url(
+    client_logged_in, gcs_bucket_mock, song_factory
+):
+    song = song_factory(["score.pdf"])
+    song_file = song.song_files.get()
+    blob_mock = gcs_bucket_mock.blob.return_value
+    blob_mock.generate_signed_url.return_value = "https://storage.example/signed"
+
+    response = client_logged_in.get(song_file.get_absolute_url())
+    assert response.status_code == 302
+    assert response.url == "https://storage.example/signed"
+    assert response["Cache-Control"].startswith("private, max-age=")
+    blob_mock.generate_signed_url.assert_called_once_with(
+        version="v2", response_disposition="attachment", expiration=mock.ANY
+    )
+
+    blob_mock.generate_signed_url.reset_mock()
+    response = client_logged_in.get(song_file.get_preview_url())
+    assert response.status_code == 302
+    blob_mock.generate_signed_url.assert_called_once_with(
+        version="v2", response_disposition="inline", expiration=mock.ANY
+    )
+
+
+def test_song_file_wrong_song_404(client_logged_in, song_factory):
+    song_file = song_factory(["score.pdf"]).song_files.get()
+    response = client_logged_in.get(f"/song/other-song/file/{song_file.pk}")
+    assert response.status_code == 404
+
+
+def test_song_file_requires_login(client, song_factory):
+    song_file = song_factory(["score.pdf"]).song_files.get()
+    response = client.get(song_file.get_absolute_url())
+    assert response.status_code == 302
+    assert "/accounts/login/" in response.url
+
+
+def test_music_detail_missing_song(client_logged_in):
+    response = client_logged_in.get(reverse("song_detail", args=["nothing"]))
+    assert response.status_code == 404
+
+
+def test_music_detail_requires_login(client, song_factory):
+    song_factory([])
+    response = client.get(reverse("song_detail", args=["test-song"]))
+    assert response.status_code == 302
+    assert "/accounts/login/" in response.url
 
-    # MP3: one call with correct params
-    mp3_blob_mock.generate_signed_url.assert_called_once_with(
-        response_disposition="attachment",
-        expiration=mock.ANY
+
+def test_home_anonymous(client, db):
+    response = client.get(reverse("home"))
+    assert response.status_code == 200
+    assert b"This is a site for members only" in response.content
+
+
+@pytest.fixture
+def songs(db):
+    names = ["Bohemian Rhapsody", "Blackbird", "Hallelujah", "Bridge over Troubled"]
+    return [
+        Song.objects.create(name=name, slug=name.lower().replace(" ", "-"))
+        for name in names
+    ]
+
+
+def test_song_search_matches_word_prefixes(songs):
+    results = Song.objects.search("bo").order_by("name")
+    assert [song.name for song in results] == ["Bohemian Rhapsody"]
+    results = Song.objects.search("b").order_by("name")
+    assert [song.name for song in results] == [
+        "Blackbird", "Bohemian Rhapsody", "Bridge over Troubled",
+    ]
+    assert [song.name for song in Song.objects.search("troub brid")] == [
+        "Bridge over Troubled"
+    ]
+
+
+def test_song_search_ignores_punctuation_only_query(songs):
+    assert list(Song.objects.search("\"*")) == []
+
+
+def test_song_search_index_follows_updates(songs):
+    song = songs[0]
+    song.name = "Yesterday"
+    song.save()
+    assert list(Song.objects.search("yes")) == [song]
+    assert list(Song.objects.search("bohem")) == []
+    song.delete()
+    assert list(Song.objects.search("yes")) == []
+
+
+def test_song_search_view(client_logged_in, songs):
+    response = client_logged_in.get(reverse("song_search"), {"q": "hall"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "results": [{"name": "Hallelujah", "url": "/song/hallelujah"}]
+    }
+
+
+def test_song_list_is_paginated(client_logged_in, db):
+    Song.objects.bulk_create(
+        Song(name=f"Song {i:03}", slug=f"song-{i:03}") for i in range(60)
     )
+    response = client_logged_in.get(reverse("all_songs"))
+    assert len(response.context["song_list"]) == 50
+    response = client_logged_in.get(reverse("all_songs"), {"page": 2})
+    assert len(response.context["song_list"]) == 10
+    assert response.context["song_list"][0].name == "Song 050"
+
+
+def test_song_save_builds_file_manifest(song_factory):
+    song = song_factory(["media/Alto_part.mp3", "media/Score.PDF"])
+    files = list(song.song_files.all())
+    assert [f.name for f in files] == ["Score.PDF", "Alto_part.mp3"]
+    assert [f.suffix for f in files] == [".pdf", ".mp3"]
+    assert files[1].display_name == "Alto part"
 
-    expected = [
-        {
-            "url": "signed-url-pdf",
-            "path": pathlib.Path("score.pdf"),
-            "preview": "signed-url-pdf",
-        },
-        {
-            "url": "signed-url-mp3",
-            "path": pathlib.Path("audio.mp3"),
-        },
+    song.files = json.dumps(["media/Score.PDF", "media/Tenor.mp3"])
+    song.save()
+    assert list(song.song_files.values_list("name", flat=True)) == [
+        "Score.PDF", "Tenor.mp3"
     ]
-    assert result == expected
+    assert SongFile.objects.get(name="Score.PDF").pk == files[0].pk
 
 
-def test_file_urls_sorts_pdf_first_and_by_name(gcs_bucket_mock, song_factory):
-    files = ["b.mp3", "a.pdf", "c.pdf", "a.mp3"]
-    song = song_factory(files)
+def test_fill_file_sizes(gcs_bucket_mock, song_factory):
+    song = song_factory(["score.pdf", "missing.mp3"])
+    gcs_bucket_mock.get_blob.side_effect = lambda path: (
+        mock.Mock(size=1234) if path == "score.pdf" else None
+    )
+    song.fill_file_sizes()
+    sizes = dict(song.song_files.values_list("name", "size"))
+    assert sizes == {"score.pdf": 1234, "missing.mp3": None}
 
-    # Create a blob mock for each file
-    blob_mocks = {fname: mock.Mock() for fname in files}
-    for fname, blob in blob_mocks.items():
-        blob.generate_signed_url.return_value = f"signed-{fname}"
 
-    def blob_side_effect(fname):
-        return blob_mocks[fname]
+def test_fill_file_sizes_from_memory_storage(song_factory):
+    get_song_storage().files["score.pdf"] = b"%PDF-1.4"
+    song = song_factory(["score.pdf"])
+    song.fill_file_sizes()
+    assert song.song_files.get().size == 8
 
-    gcs_bucket_mock.blob.side_effect = blob_side_effect
 
-    result = song.file_urls
-    sorted_paths = [entry["path"].name for entry in result]
+def test_saving_song_queues_file_sizes(song_factory):
+    get_song_storage().files["score.pdf"] = b"%PDF-1.4"
+    song = song_factory(["score.pdf"])
+    assert song.song_files.get().size is None
+    assert Task.objects.get().name == fill_file_sizes.task_name
 
-    # Expected: PDFs first, sorted by name; then MP3s, sorted by name
-    expected_order = ["a.pdf", "c.pdf", "a.mp3", "b.mp3"]
-    assert sorted_paths == expected_order
+    run_pending()
+    assert song.song_files.get().size == 8
+    song.save()
+    assert Task.objects.count() == 1
+
+
+def test_song_list_shows_file_summary(client_logged_in, song_factory):
+    song_factory(["a.pdf", "b.pdf", "c.mp3"])
+    response = client_logged_in.get(reverse("songs"))
+    song = response.context["song_list"][0]
+    assert (song.file_count, song.pdf_count, song.audio_count) == (3, 2, 1)
+    assert b"PDF 2" in response.content
@@ -0,0 +1,166 @@
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.db import connections
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event, EventType, Occurrence
+from lhc_sharing.queries import (
+    RepeatedQueriesError,
+    _execute_wrapper,
+    fingerprint,
+    repeated_query_middleware,
+)
+
+
+@pytest.fixture
+def occurrences(db):
+    event_type = EventType.objects.create(label="Rehearsal")
+    start = timezone.now() + timedelta(days=1)
+    return Occurrence.objects.bulk_create([
+        Occurrence(
+            event=Event.objects.create(title=f"Event {n}", event_type=event_type),
+            start_time=start + timedelta(days=n),
+        )
+        for n in range(6)
+    ])
+
+
+def titles():
+    return ",".join(o.title for o in Occurrence.objects.all())
+
+
+def sync_view(request):
+    return HttpResponse(titles())
+
+
+async def async_view(request):
+    return HttpResponse(await sync_to_async(titles)())
+
+
+def template_view(request):
+    engine = Engine(
+        loaders=[(
+            "django.template.loaders.locmem.Loader",
+            {"list.html": "<ul>\n{% for o in object_list %}<li>{{ o.title }}\n"
+                          "{% endfor %}</ul>"},
+        )]
+    )
+    template = engine.get_template("list.html")
+    return HttpResponse(
+        template.render(Context({"object_list": Occurrence.objects.all()}))
+    )
+
+
+def get(view):
+    response = repeated_query_middleware(view)(RequestFactory().get("/calendar/"))
+    if inspect.isawaitable(response):
+        async def wait():
+            return await response
+
+        response = async_to_sync(wait)()
+    return response
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        (
+            'SELECT "id" FROM "t" WHERE "id" IN (%s, %s, %s)',
+            'SELECT "id" FROM "t" WHERE "id" IN (...)',
+        ),
+        (
+            "SELECT *  FROM t\n WHERE name = 'O''Brien' LIMIT 21",
+            "SELECT * FROM t WHERE name = ? LIMIT ?",
+        ),
+    ],
+)
+def test_fingerprint(sql, expected):
+    assert fingerprint(sql) == expected
+
+
+def test_repeated_query_raises_with_code_location(occurrences):
+    with pytest.raises(RepeatedQueriesError) as error:
+        get(sync_view)
+    message = str(error.value)
+    assert message.startswith("1 repeated query in /calendar/")
+    assert '6 × SELECT "events_event"."id"' in message
+    assert "from events/models.py:" in message
+    assert "in title" in message
+
+
+def test_repeated_query_in_async_view(occurrences):
+    with pytest.raises(RepeatedQueriesError):
+        get(async_view)
+
+
+def test_repeated_query_reports_template_line(occurrences):
+    with pytest.raises(RepeatedQueriesError, match=r"from list\.html:2, "):
+        get(template_view)
+
+
+def test_below_threshold(occurrences, settings):
+    settings.REPEATED_QUERY_THRESHOLD = 7
+    assert get(sync_view).status_code == 200
+
+
+@pytest.fixture
+def production(settings):
+    settings.REPEATED_QUERY_RAISE = False
+    settings.DEBUG = False
+
+
+def test_production_samples_requests(occurrences, production, settings, caplog):
+    settings.REPEATED_QUERY_SAMPLE_RATE = 0
+    with caplog.at_level(logging.WARNING, "lhc_sharing.queries"):
+        get(sync_view)
+    assert caplog.records == []
+
+    settings.REPEATED_QUERY_SAMPLE_RATE = 1
+    with caplog.at_level(logging.WARNING, "lhc_sharing.queries"):
+        get(sync_view)
+    assert "1 repeated query in /calendar/" in caplog.text
+
+
+def test_production_reports_to_sentry(occurrences, production, settings):
+    settings.REPEATED_QUERY_SAMPLE_RATE = 1
+    settings.SENTRY_DSN = "https://key@sentry.example/1"
+    with mock.patch("sentry_sdk.capture_message") as capture:
+        get(sync_view)
+    capture.assert_called_once()
+    assert capture.call_args.args[0].startswith("Repeated query from events/models")
+
+
+def test_pages_do_not_repeat_queries(client, occurrences):
+    client.force_login(User.objects.create_user(username="member"))
+    now = timezone.localtime()
+    for url in [
+        reverse("event-agenda"),
+        reverse("event-monthly-view", args=[now.year, now.month]),
+        reverse("my-rota"),
+    ]:
+        assert client.get(url).status_code == 200
+
+
+def test_wrapper_is_on_connections_opened_in_other_threads(db):
+    # As when an async view's queries run in a sync_to_async thread.
+    def open_connection():
+        connection = connections["default"]
+        connection.ensure_connection()
+        try:
+            return _execute_wrapper in connection.execute_wrappers
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(open_connection).result()
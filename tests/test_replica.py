@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event, EventType, Occurrence
+from lhc_sharing.db import PIN_COOKIE, ReplicaRouter, replica_middleware
+
+
+@pytest.fixture
+def replica(transactional_db, settings, tmp_path):
+    """
+    A second SQLite database standing in for a replica. It only sees the
+    primary's data when ``replicate()`` is called, so the lag lasts until
+    the test says otherwise.
+    """
+    config = {
+        **connections["default"].settings_dict,
+        "NAME": str(tmp_path / "replica.sqlite3"),
+    }
+    connections.settings["replica"] = config
+    settings.DATABASE_ROUTERS = ["lhc_sharing.db.ReplicaRouter"]
+    # Connect straight away: the test case only allows lazy connections to
+    # the databases that existed when it started.
+    connections["replica"].connect()
+
+    def replicate():
+        connections["default"].ensure_connection()
+        connections["default"].connection.backup(connections["replica"].connection)
+
+    yield replicate
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
+
+
+@pytest.fixture
+def occurrence(replica):
+    return Occurrence.objects.create(
+        event=Event.objects.create(
+            title="Rehearsal", event_type=EventType.objects.create(label="Rehearsal")
+        ),
+        start_time=timezone.now() + timedelta(days=1),
+    )
+
+
+def routed_reads(request):
+    router = ReplicaRouter()
+
+    def view(request):
+        aliases = [router.db_for_read(User)]
+        if request.GET.get("write"):
+            router.db_for_write(User)
+        aliases.append(router.db_for_read(User))
+        with transaction.atomic():
+            aliases.append(router.db_for_read(User))
+        return HttpResponse(",".join(aliases))
+
+    return replica_middleware(view)(request)
+
+
+def test_reads_go_to_replica_until_a_write(replica):
+    response = routed_reads(RequestFactory().get("/"))
+    assert response.content == b"replica,replica,default"
+    assert PIN_COOKIE not in response.cookies
+
+    response = routed_reads(RequestFactory().get("/", {"write": "1"}))
+    assert response.content == b"replica,default,default"
+    assert response.cookies[PIN_COOKIE]["max-age"] == 10
+
+    request = RequestFactory().get("/")
+    request.COOKIES[PIN_COOKIE] = "1"
+    assert routed_reads(request).content == b"default,default,default"
+
+
+def test_reads_outside_requests_use_primary(replica):
+    assert ReplicaRouter().db_for_read(User) == "default"
+
+
+def test_database_cache_uses_primary_without_pinning(replica):
+    cache_model = DatabaseCache("lhc_cache", {}).cache_model_class
+    router = ReplicaRouter()
+
+    def view(request):
+        aliases = [
+            router.db_for_read(cache_model),
+            router.db_for_write(cache_model),
+            router.db_for_read(User),
+        ]
+        return HttpResponse(",".join(aliases))
+
+    response = replica_middleware(view)(RequestFactory().get("/"))
+    assert response.content == b"default,default,replica"
+    assert PIN_COOKIE not in response.cookies
+
+
+def test_cron_commands_read_from_primary(client, replica, settings, monkeypatch):
+    settings.CRON_SECRET = "secret"
+    aliases = []
+    monkeypatch.setattr(
+        "lhc_sharing.cron.call_command",
+        lambda *args, **kwargs: aliases.append(ReplicaRouter().db_for_read(User)),
+    )
+    response = client.get(
+        reverse("cron", args=["runtasks"]), HTTP_AUTHORIZATION="Bearer secret"
+    )
+    assert response.status_code == 200
+    assert aliases == ["default"]
+
+
+def test_member_reads_their_own_signup(client, occurrence, replica):
+    member = User.objects.create_user(username="member")
+    client.force_login(member)
+    other_client = Client()
+    other_client.force_login(User.objects.create_user(username="other"))
+    replica()
+    grid = reverse("occurrence_signup_grid", args=[occurrence.event_id])
+
+    response = client.post(grid, {"occurrence_id": occurrence.id, "role": "opener"})
+    assert PIN_COOKIE in response.cookies
+
+    # The replica hasn't caught up, but the member is pinned to the primary.
+    response = client.get(grid)
+    assert response.context["occurrences"][0].opener == member
+
+    # Everyone else reads the lagging replica until it catches up.
+    response = other_client.get(grid)
+    assert response.context["occurrences"][0].opener is None
+    replica()
+    response = other_client.get(grid)
+    assert response.context["occurrences"][0].opener == member
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.exceptions import SuspiciousFileOperation
+from django.test import RequestFactory
+
+from music.models import Song
+from music.storage import (
+    LocalSongStorage,
+    RangeNotSatisfiable,
+    get_song_storage,
+    parse_range,
+)
+
+CONTENT = bytes(range(100))
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-9", (0, 9)),
+        ("bytes=90-", (90, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=-500", (0, 99)),
+        ("bytes=95-200", (95, 99)),
+        ("bytes=0-1,5-6", None),
+        ("items=0-9", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=9-5", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 100)
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    (tmp_path / "songs").mkdir()
+    (tmp_path / "songs" / "tenor.mp3").write_bytes(CONTENT)
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+    return LocalSongStorage(tmp_path / "songs")
+
+
+def serve(storage, range_header=None, disposition="inline"):
+    headers = {"HTTP_RANGE": range_header} if range_header else {}
+    request = RequestFactory().get("/", **headers)
+    return storage.serve(request, "tenor.mp3", disposition, "Tenor.mp3")
+
+
+def test_local_storage_serves_whole_file(local_storage):
+    response = serve(local_storage, disposition="attachment")
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == CONTENT
+    assert response["Content-Length"] == "100"
+    assert response["Content-Type"] == "audio/mpeg"
+    assert response["Accept-Ranges"] == "bytes"
+    assert response["Content-Disposition"] == 'attachment; filename="Tenor.mp3"'
+
+
+def test_local_storage_serves_range(local_storage):
+    response = serve(local_storage, "bytes=10-19")
+    assert response.status_code == 206
+    assert b"".join(response.streaming_content) == CONTENT[10:20]
+    assert response["Content-Length"] == "10"
+    assert response["Content-Range"] == "bytes 10-19/100"
+    assert response["Content-Disposition"] == 'inline; filename="Tenor.mp3"'
+
+
+def test_local_storage_unsatisfiable_range(local_storage):
+    response = serve(local_storage, "bytes=200-")
+    assert response.status_code == 416
+    assert response["Content-Range"] == "bytes */100"
+
+
+def test_local_storage_rejects_paths_outside_root(local_storage):
+    with pytest.raises(SuspiciousFileOperation):
+        local_storage.local_path("../secret.txt")
+    assert local_storage.size("tenor.mp3") == 100
+    assert local_storage.size("missing.mp3") is None
+
+
+def test_song_file_view_serves_from_storage(client, db):
+    client.force_login(User.objects.create_user(username="member"))
+    song = Song.objects.create(
+        name="Test Song", slug="test-song", files=json.dumps(["tenor.mp3"])
+    )
+    get_song_storage().files["tenor.mp3"] = CONTENT
+    song_file = song.song_files.get()
+
+    response = client.get(song_file.get_absolute_url(), HTTP_RANGE="bytes=-10")
+    assert response.status_code == 206
+    assert b"".join(response.streaming_content) == CONTENT[90:]
+    assert response["Cache-Control"] == "private, max-age=3600"
+
+    response = client.get(song_file.get_preview_url())
+    assert response.status_code == 200
+    assert response["Content-Disposition"].startswith("inline")
+
+    del get_song_storage().files["tenor.mp3"]
+    assert client.get(song_file.get_absolute_url()).status_code == 404
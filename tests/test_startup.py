@@ -0,0 +1,16 @@
+from lhc_sharing.importtime import STARTUP_BUDGET_MS, measure_startup
+
+# Wall-clock time depends on the machine and its load, so the test only fails
+# a start several times over budget. `manage.py importtime --check` holds it
+# to the budget itself.
+BUDGET_MULTIPLE = 5
+
+
+def test_cold_start_imports(monkeypatch):
+    # As in production, where Sentry is set up at startup.
+    monkeypatch.setenv("SENTRY_DSN", "https://key@sentry.example/1")
+    report = measure_startup()
+    assert report.loaded_deferred == []
+    assert report.total_ms < STARTUP_BUDGET_MS * BUDGET_MULTIPLE, "\n".join(
+        f"{ms:.1f} ms {package}" for package, ms in report.by_package()[:10]
+    )
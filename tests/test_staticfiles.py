@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.templatetags.static import static
+
+
+@pytest.fixture
+def static_root(settings, tmp_path):
+    settings.STATIC_ROOT = tmp_path
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {
+            "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+        },
+    }
+    return tmp_path
+
+
+def test_static_uses_hashed_names_from_manifest(static_root):
+    (static_root / "staticfiles.json").write_text(json.dumps({
+        "paths": {"main.css": "main.0123456789ab.css"},
+        "version": "1.1",
+        "hash": "",
+    }))
+    assert static("main.css") == "/static/main.0123456789ab.css"
+
+
+def test_static_without_manifest_fails(static_root):
+    with pytest.raises(ValueError, match="Missing staticfiles manifest entry"):
+        static("main.css")
+
+
+def test_vercel_function_gets_the_manifest():
+    config = json.loads((settings.BASE_DIR / "vercel.json").read_text())
+    static_build, function = config["builds"]
+    assert static_build["use"] == "@vercel/static-build"
+    manifest = Path(settings.STATIC_ROOT) / "staticfiles.json"
+    assert str(manifest) in function["config"]["includeFiles"]
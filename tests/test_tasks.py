@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.queue import claim, retry_delay, run_pending, task
+
+calls = []
+
+
+@task(max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def test_enqueue_stores_task(db):
+    queued = record.enqueue("hello")
+    assert queued.name == record.task_name
+    assert queued.args == ["hello"]
+    assert queued.status == Task.Status.PENDING
+    assert calls == []
+
+
+def test_run_pending_runs_due_tasks(db):
+    record.enqueue(1)
+    later = record.enqueue(2)
+    later.run_after = timezone.now() + timedelta(hours=1)
+    later.save()
+
+    run_pending()
+    assert calls == [1]
+    assert Task.objects.get(args=[1]).status == Task.Status.DONE
+    assert Task.objects.get(args=[2]).status == Task.Status.PENDING
+
+
+def test_failed_task_is_retried_with_backoff_then_fails(db):
+    queued = fail.enqueue()
+    run_pending()
+    queued.refresh_from_db()
+    assert queued.status == Task.Status.PENDING
+    assert queued.attempts == 1
+    assert "RuntimeError: boom" in queued.last_error
+    assert queued.run_after > timezone.now() + retry_delay(1) - timedelta(seconds=5)
+
+    Task.objects.update(run_after=timezone.now())
+    run_pending()
+    queued.refresh_from_db()
+    assert queued.status == Task.Status.FAILED
+    assert queued.attempts == 2
+
+
+def test_retry_delay_is_capped():
+    assert retry_delay(1) == timedelta(seconds=30)
+    assert retry_delay(2) == timedelta(seconds=60)
+    assert retry_delay(20) == timedelta(hours=1)
+
+
+def test_claim_does_not_return_running_tasks(db):
+    record.enqueue(1)
+    assert len(claim(10)) == 1
+    assert claim(10) == []
+
+
+def test_expired_lease_is_reclaimed(db):
+    record.enqueue(1)
+    claim(10)
+    Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+    assert [t.attempts for t in claim(10)] == [2]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_runtasks_command():
+    record.enqueue(1)
+    record.enqueue(2)
+    call_command("runtasks", once=True, concurrency=2, poll_interval=0.01)
+    assert sorted(calls) == [1, 2]
+    assert not Task.objects.exclude(status=Task.Status.DONE).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cron_runs_tasks(client, settings):
+    for value in range(6):
+        record.enqueue(value)
+    url = reverse("cron", args=["runtasks"])
+    assert client.get(url).status_code == 404
+
+    settings.CRON_SECRET = "secret"
+    assert client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+    assert client.get(
+        reverse("cron", args=["migrate"]), HTTP_AUTHORIZATION="Bearer secret"
+    ).status_code == 404
+
+    response = client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+    assert response.status_code == 200
+    assert sorted(calls) == list(range(6))
+    assert f"{record.task_name} #" in response.content.decode()
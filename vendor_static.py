@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Download the pinned front-end dependencies into static/vendor.
+
+The files are then hashed and compressed by ``collectstatic`` along with the
+rest of the static files, so the site doesn't depend on third-party CDNs.
+Only the standard library is used so this can run before the project
+dependencies are installed or any settings are available.
+"""
+
+import base64
+import hashlib
+import re
+import sys
+import urllib.request
+from pathlib import Path
+
+VENDOR_DIR = Path(__file__).resolve().parent / "static" / "vendor"
+
+JSDELIVR = "https://cdn.jsdelivr.net/npm"
+RUBIK = f"{JSDELIVR}/@fontsource-variable/rubik@5.2.5/files"
+
+# (url, destination relative to VENDOR_DIR, subresource integrity or None)
+ASSETS = [
+    (
+        f"{JSDELIVR}/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+        "bootstrap/bootstrap.min.css",
+        "sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH",
+    ),
+    (
+        f"{JSDELIVR}/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+        "bootstrap/bootstrap.bundle.min.js",
+        "sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz",
+    ),
+    (
+        f"{JSDELIVR}/bootstrap-icons@1.8.1/font/bootstrap-icons.css",
+        "bootstrap-icons/bootstrap-icons.css",
+        None,
+    ),
+    (
+        f"{JSDELIVR}/bootstrap-icons@1.8.1/font/fonts/bootstrap-icons.woff2",
+        "bootstrap-icons/fonts/bootstrap-icons.woff2",
+        None,
+    ),
+    (
+        f"{JSDELIVR}/bootstrap-icons@1.8.1/font/fonts/bootstrap-icons.woff",
+        "bootstrap-icons/fonts/bootstrap-icons.woff",
+        None,
+    ),
+    # Only the latin subset of the variable Rubik font is used; Roboto was
+    # loaded but never referenced by the stylesheets.
+    (
+        f"{RUBIK}/rubik-latin-wght-normal.woff2",
+        "rubik/rubik-latin-wght-normal.woff2",
+        None,
+    ),
+    (
+        f"{RUBIK}/rubik-latin-wght-italic.woff2",
+        "rubik/rubik-latin-wght-italic.woff2",
+        None,
+    ),
+    (
+        f"{JSDELIVR}/marked@15.0.12/lib/marked.umd.js",
+        "marked/marked.umd.js",
+        None,
+    ),
+]
+
+# collectstatic fails on references to source maps that aren't shipped.
+SOURCE_MAP_RE = re.compile(
+    rb"\n?(/\*# sourceMappingURL=[^*]*\*/|//# sourceMappingURL=\S*)"
+)
+
+
+def integrity_of(content, algorithm="sha384"):
+    digest = base64.b64encode(hashlib.new(algorithm, content).digest()).decode()
+    return f"{algorithm}-{digest}"
+
+
+def check_integrity(content, integrity):
+    algorithm = integrity.split("-", 1)[0]
+    return integrity_of(content, algorithm) == integrity
+
+
+def main():
+    for url, dest, integrity in ASSETS:
+        path = VENDOR_DIR / dest
+        with urllib.request.urlopen(url) as response:
+            content = response.read()
+        if integrity is None:
+            print(f"No integrity recorded for {url}: {integrity_of(content)}",
+                  file=sys.stderr)
+        elif not check_integrity(content, integrity):
+            sys.exit(f"Integrity check failed for {url}")
+        if path.suffix in (".css", ".js"):
+            content = SOURCE_MAP_RE.sub(b"", content)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        print(f"{url} -> {path.relative_to(VENDOR_DIR.parent.parent)}")
+
+
+if __name__ == "__main__":
+    main()